@@ -1,23 +1,116 @@
+import logging
 import os
-import mysql.connector
+import threading
+import time
+
 from mysql.connector import Error
+from mysql.connector.errors import PoolError
+from mysql.connector.pooling import MySQLConnectionPool
+from fastapi import HTTPException
+
+
+def _load_config() -> dict:
+    """
+    Read DB settings once at import; fail fast if any are missing.
+    """
+    missing = [k for k in ("DB_HOST", "DB_PORT", "DB_USER", "DB_NAME") if not os.getenv(k)]
+    if missing:
+        raise RuntimeError(f"Missing database settings: {', '.join(missing)}")
+    try:
+        port = int(os.getenv("DB_PORT"))
+    except ValueError:
+        raise RuntimeError(f"DB_PORT must be an integer, got {os.getenv('DB_PORT')!r}")
+
+    return dict(
+        host=os.getenv("DB_HOST"),
+        port=port,
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_NAME"),
+    )
+
+
+_CFG = _load_config()
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+# How long get_db() keeps retrying when every pooled connection is checked out.
+_POOL_WAIT_SEC = 5.0
+
+
+def _get_pool() -> MySQLConnectionPool:
+    """
+    Create the shared connection pool on first use,
+    so importing this module never opens a connection.
+    """
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = MySQLConnectionPool(
+                    pool_name="itrack",
+                    # worker threads + DB_POOL_HEADROOM (see main.py); 32 is
+                    # mysql-connector's maximum pool size
+                    pool_size=int(os.getenv("DB_POOL_SIZE", 32)),
+                    # skip the per-checkout session reset round-trip;
+                    # set DB_POOL_RESET_SESSION=1 if handlers leave session state behind
+                    pool_reset_session=os.getenv("DB_POOL_RESET_SESSION", "0") == "1",
+                    use_pure=False,  # C extension (faster row decoding)
+                    **_CFG,
+                )
+    return _POOL
+
 
 def get_db():
+    """
+    Borrow a connection from the pool.
+    Hand it back with release_db(conn), never a bare conn.close().
+    Returns None (after logging why) if no connection can be had;
+    callers answer that with a 503, as db_dep does.
+    """
     try:
-        conn = mysql.connector.connect(
-            host=os.getenv("DB_HOST"),
-            port=int(os.getenv("DB_PORT")),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            database=os.getenv("DB_NAME"),
-        )
-
-        if conn.is_connected():
-            return conn
-
-        print("❌ Database connected but connection is not active.")
-        return None
+        pool = _get_pool()
+        deadline = time.monotonic() + _POOL_WAIT_SEC
+        while True:
+            try:
+                # the pool reconnects stale connections before handing them out
+                return pool.get_connection()
+            except PoolError:
+                # pool exhausted: wait for another request to give one back
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.05)
 
     except Error as e:
-        print("❌ Database connection error:", e)
+        logging.error("Database connection error: %s", e)
         return None
+
+
+def release_db(conn) -> None:
+    """
+    Return a connection from get_db() to the pool.
+    The pool no longer resets sessions and autocommit is off, so even a
+    plain SELECT leaves a transaction open; roll it back here or the next
+    borrower gets a stale snapshot and "Transaction already in progress".
+    """
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+    except Error:
+        pass
+    conn.close()
+
+
+def db_dep():
+    """
+    FastAPI dependency: one pooled connection per request,
+    always returned to the pool when the request is done.
+    """
+    conn = get_db()
+    if conn is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    try:
+        yield conn
+    finally:
+        release_db(conn)
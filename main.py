@@ -1,31 +1,66 @@
 import logging
 import os
 
+from anyio import to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
+# Load .env before the routers import db / jwt_tools, which read env at import
+load_dotenv()
+
 from routers.auth import router as auth_router
 from routers.users import router as users_router
 from routers.items import router as items_router
 from routers.predict import router as predict_router
-from routers.orders import router as orders_router
+from routers.orders import router as orders_router, check_report_table
 from routers.sales import router as sales_router
 from routers.predictive import router as predictive_router
 from routers.reports import router as reports_router
 from routers.dashboard import router as dashboard_router
 from routers.activity_logs import router as activity_logs_router
+from routers.activity_logger import start_activity_writer, stop_activity_writer
+from utils.responses import FastJSONResponse
 
-load_dotenv()
 logging.basicConfig(level=logging.INFO)
 
-app = FastAPI()
+# orjson for every JSON response (Decimal/datetime rows included)
+app = FastAPI(default_response_class=FastJSONResponse)
+
+# ----------------------------------------------------------
+# Background activity-log writer (batched INSERTs)
+# ----------------------------------------------------------
+app.add_event_handler("startup", start_activity_writer)
+app.add_event_handler("shutdown", stop_activity_writer)
+
+# Fail at boot, not in add_or, if the report table migrations weren't applied
+app.add_event_handler("startup", check_report_table)
+
+# ----------------------------------------------------------
+# Worker threads for sync (def) endpoints
+# ----------------------------------------------------------
+def set_threadpool_size():
+    """
+    Sync handlers run in AnyIO's thread pool (default 40 threads).
+    Size it below the DB pool so a request never holds a thread while
+    waiting for a connection that can't be free. The headroom
+    (DB_POOL_HEADROOM, default 8) covers connections held outside handler
+    threads: the activity-log writer and streamed report responses, which
+    keep theirs after the handler returns.
+    """
+    pool_size = int(os.getenv("DB_POOL_SIZE", 32))
+    headroom = int(os.getenv("DB_POOL_HEADROOM", 8))
+    size = int(os.getenv("THREADPOOL_SIZE", max(1, pool_size - headroom)))
+    to_thread.current_default_thread_limiter().total_tokens = size
+
+
+app.add_event_handler("startup", set_threadpool_size)
 
 # ----------------------------------------------------------
 # Root endpoint (Render health check / quick online test)
 # ----------------------------------------------------------
 @app.get("/")
-def root():
+async def root():
     return {"status": "ok"}
 
 # ----------------------------------------------------------
@@ -45,14 +80,35 @@ env_origins = os.getenv(
 
 extra_origins = [o.strip() for o in env_origins.split(",") if o.strip()]
 
-origins = base_origins + extra_origins
+# keep order, drop duplicates
+origins = list(dict.fromkeys(base_origins + extra_origins))
+
+
+class SetCORSMiddleware(CORSMiddleware):
+    """
+    CORSMiddleware that checks the request Origin against a frozenset
+    instead of scanning the allow-list on every request.
+    """
+
+    def __init__(self, app, **kwargs):
+        super().__init__(app, **kwargs)
+        self._allowed_set = frozenset(self.allow_origins)
+
+    def is_allowed_origin(self, origin: str) -> bool:
+        if self.allow_all_origins:
+            return True
+        if self.allow_origin_regex is not None and self.allow_origin_regex.fullmatch(origin):
+            return True
+        return origin in self._allowed_set
+
 
 app.add_middleware(
-    CORSMiddleware,
+    SetCORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=86400,  # let browsers cache preflight responses for 24 h
 )
 
 # ----------------------------------------------------------
@@ -0,0 +1,3 @@
+-- Keyset pagination for GET /activity-logs (after_ts + after_id)
+-- walks activity_logs newest-first by (timestamp, log_id).
+CREATE INDEX ix_al_ts_id ON activity_logs (timestamp DESC, log_id DESC);
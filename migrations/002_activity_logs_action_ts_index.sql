@@ -0,0 +1,3 @@
+-- GET /activity-logs/highlights reads the newest rows per action;
+-- each UNION ALL branch range-scans this index.
+CREATE INDEX ix_al_action_ts ON activity_logs (action, timestamp);
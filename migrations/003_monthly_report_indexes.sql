@@ -0,0 +1,5 @@
+-- GET /monthly-report and /monthly-report/job-orders:
+-- range-scan orders by month, then find Souvenir lines via item category.
+CREATE INDEX ix_order_txn_or ON `order` (transaction_date, OR_number);
+CREATE INDEX ix_item_cat_id ON item (category, item_id);
+CREATE INDEX ix_ol_item_order ON order_line (item_id, order_id);
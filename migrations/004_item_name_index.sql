@@ -0,0 +1,3 @@
+-- Single-item predictive endpoints look up stock by name
+-- (services/stock_service.get_stock_for_item).
+CREATE INDEX ix_item_name ON item (name);
@@ -0,0 +1,47 @@
+-- Pre-joined rows for GET /monthly-report (non-Souvenir orders with an OR).
+-- add_or refreshes an order's rows in the same transaction that sets its OR;
+-- deleting the order removes them via the FK.
+CREATE TABLE daily_order_line_report (
+    order_id      INT            NOT NULL,
+    order_line_id INT            NOT NULL,
+    or_number     VARCHAR(64)    NOT NULL,
+    payer         VARCHAR(255)   NULL,
+    date          DATETIME       NOT NULL,
+    qty_sold      INT            NOT NULL,
+    unit          VARCHAR(32)    NOT NULL,
+    description   VARCHAR(255)   NOT NULL,
+    unit_cost     DECIMAL(12, 2) NOT NULL,
+    total_cost    DECIMAL(14, 2) NOT NULL,
+    PRIMARY KEY (order_id, order_line_id),
+    KEY ix_dolr_date (date, order_id, order_line_id),
+    CONSTRAINT fk_dolr_order FOREIGN KEY (order_id)
+        REFERENCES `order` (order_id) ON DELETE CASCADE
+);
+
+-- Backfill from existing completed orders
+INSERT INTO daily_order_line_report
+    (order_id, order_line_id, or_number, payer, date, qty_sold, unit,
+     description, unit_cost, total_cost)
+SELECT
+    o.order_id,
+    ol.order_line_id,
+    o.OR_number,
+    o.customer_name,
+    o.transaction_date,
+    ol.quantity,
+    COALESCE(i.unit, 'pcs'),
+    i.name,
+    i.price,
+    ol.quantity * i.price
+FROM `order` o
+JOIN order_line ol ON ol.order_id = o.order_id
+JOIN item i ON i.item_id = ol.item_id
+LEFT JOIN (
+    SELECT DISTINCT ol2.order_id
+    FROM item i2
+    JOIN order_line ol2 ON ol2.item_id = i2.item_id
+    WHERE i2.category = 'Souvenir'
+) sv ON sv.order_id = o.order_id
+WHERE o.transaction_date IS NOT NULL
+  AND o.OR_number IS NOT NULL
+  AND sv.order_id IS NULL;
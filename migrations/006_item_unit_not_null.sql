@@ -0,0 +1,9 @@
+-- Reports no longer COALESCE(i.unit, 'pcs'): make the default part of the column.
+-- Backfill first; MODIFY ... NOT NULL fails on existing NULLs in strict mode.
+UPDATE item SET unit = 'pcs' WHERE unit IS NULL;
+ALTER TABLE item MODIFY unit VARCHAR(32) NOT NULL DEFAULT 'pcs';
+
+-- Souvenir lines for /monthly-report/job-orders: filter on category and read
+-- name/price/unit from the index alone (replaces the 003 index).
+DROP INDEX ix_item_cat_id ON item;
+CREATE INDEX ix_item_cat_cover ON item (category, item_id, name, price, unit);
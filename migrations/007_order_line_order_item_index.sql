@@ -0,0 +1,3 @@
+-- GET /reports/monthly: after the transaction_date range scan on `order`
+-- (ix_order_txn_or, 003), reach each order's lines by order_id.
+CREATE INDEX ix_ol_order_item ON order_line (order_id, item_id, quantity);
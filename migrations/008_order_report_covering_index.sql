@@ -0,0 +1,11 @@
+-- Monthly reports read order_id, transaction_date, OR_number and
+-- customer_name for the month's orders. Widening 003's index with
+-- customer_name makes that range scan index-only (InnoDB secondary
+-- indexes already carry the order_id primary key). The OR_number
+-- predicates are checked in the index via ICP.
+DROP INDEX ix_order_txn_or ON `order`;
+CREATE INDEX ix_order_txn_or_payer ON `order` (transaction_date, OR_number, customer_name);
+
+-- order_line side: 007's (order_id, item_id, quantity) + the implicit
+-- order_line_id PK already covers the join. item is joined on its
+-- clustered primary key.
@@ -0,0 +1,7 @@
+-- Role lookups by name match on LOWER(TRIM(role_name)); keep that value in an
+-- indexed generated column so the lookup is a plain equality seek
+-- (routers/auth.register; routers/users resolves roles from its cache).
+ALTER TABLE roles
+    ADD COLUMN role_name_norm VARCHAR(64)
+        GENERATED ALWAYS AS (LOWER(TRIM(role_name))) STORED,
+    ADD INDEX ix_roles_name_norm (role_name_norm);
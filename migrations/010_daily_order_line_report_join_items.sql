@@ -0,0 +1,28 @@
+-- daily_order_line_report copied item name/unit/price at OR time, so renamed or
+-- repriced items (and category changes to/from Souvenir) drifted from the
+-- join-based report. Keep only order/line facts + item_id; /monthly-report
+-- joins item for the descriptive columns and the Souvenir filter.
+-- Rows now cover every order with an OR (Souvenir ones included).
+TRUNCATE TABLE daily_order_line_report;
+
+ALTER TABLE daily_order_line_report
+    DROP COLUMN unit,
+    DROP COLUMN description,
+    DROP COLUMN unit_cost,
+    DROP COLUMN total_cost,
+    ADD COLUMN item_id INT NOT NULL AFTER date;
+
+INSERT INTO daily_order_line_report
+    (order_id, order_line_id, or_number, payer, date, item_id, qty_sold)
+SELECT
+    o.order_id,
+    ol.order_line_id,
+    o.OR_number,
+    o.customer_name,
+    o.transaction_date,
+    ol.item_id,
+    ol.quantity
+FROM `order` o
+JOIN order_line ol ON ol.order_id = o.order_id
+WHERE o.transaction_date IS NOT NULL
+  AND o.OR_number IS NOT NULL;
@@ -0,0 +1,41 @@
+-- Back to the 005 shape: daily_order_line_report is a snapshot taken when
+-- add_or sets the OR. Item unit/name/price (and whether the order counts as
+-- Souvenir) are frozen at that moment, so /monthly-report reads one table
+-- with no joins. Later renames or repricing do not rewrite past reports.
+TRUNCATE TABLE daily_order_line_report;
+
+ALTER TABLE daily_order_line_report
+    DROP COLUMN item_id,
+    ADD COLUMN unit        VARCHAR(32)    NOT NULL AFTER qty_sold,
+    ADD COLUMN description VARCHAR(255)   NOT NULL AFTER unit,
+    ADD COLUMN unit_cost   DECIMAL(12, 2) NOT NULL AFTER description,
+    ADD COLUMN total_cost  DECIMAL(14, 2) NOT NULL AFTER unit_cost;
+
+-- Backfill completed non-Souvenir orders (current item values are the best
+-- snapshot available for rows taken before this migration)
+INSERT INTO daily_order_line_report
+    (order_id, order_line_id, or_number, payer, date, qty_sold, unit,
+     description, unit_cost, total_cost)
+SELECT
+    o.order_id,
+    ol.order_line_id,
+    o.OR_number,
+    o.customer_name,
+    o.transaction_date,
+    ol.quantity,
+    i.unit,
+    i.name,
+    i.price,
+    ol.quantity * i.price
+FROM `order` o
+JOIN order_line ol ON ol.order_id = o.order_id
+JOIN item i ON i.item_id = ol.item_id
+LEFT JOIN (
+    SELECT DISTINCT ol2.order_id
+    FROM item i2
+    JOIN order_line ol2 ON ol2.item_id = i2.item_id
+    WHERE i2.category = 'Souvenir'
+) sv ON sv.order_id = o.order_id
+WHERE o.transaction_date IS NOT NULL
+  AND o.OR_number IS NOT NULL
+  AND sv.order_id IS NULL;
@@ -1,14 +1,30 @@
 # backend/activity_logger.py
 import logging
+import queue
+import threading
+import time
 from datetime import datetime
-from typing import Any
+from typing import Any, List, Optional
 
-from db import get_db
+from db import get_db, release_db
+
+# Rows waiting to be written: (user_id, action, description, timestamp)
+_QUEUE: "queue.SimpleQueue" = queue.SimpleQueue()
+_STOP = object()
+
+_BATCH_SIZE = 500
+_FLUSH_INTERVAL_SEC = 0.5
+
+_writer: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
 
 
 def log_activity(user_id: Any, action: str, description: str) -> None:
     """
-    Insert a row into activity_logs.
+    Queue a row for activity_logs.
+    The background writer inserts it with the next batch, so this never
+    touches the DB and is safe to call inline (or from async handlers)
+    without BackgroundTasks.
     """
 
     try:
@@ -19,21 +35,38 @@ def log_activity(user_id: Any, action: str, description: str) -> None:
     except (TypeError, ValueError):
         uid = 0
 
+    _QUEUE.put((uid, action, description, datetime.now()))
+
+
+def _write_batch(batch: List[tuple]) -> None:
+    """
+    Insert a batch of queued rows as one multi-row INSERT in one transaction.
+    """
+    if not batch:
+        return
+
     conn = None
     cur = None
     try:
         conn = get_db()
         cur = conn.cursor()
+        values_sql = ", ".join(["(%s, %s, %s, %s)"] * len(batch))
+        params = [v for row in batch for v in row]
+
+        conn.start_transaction()
         cur.execute(
-            """
-            INSERT INTO activity_logs (user_id, action, description, timestamp)
-            VALUES (%s, %s, %s, %s)
-            """,
-            (uid, action, description, datetime.now()),
+            "INSERT INTO activity_logs (user_id, action, description, timestamp) "
+            f"VALUES {values_sql}",
+            params,
         )
         conn.commit()
     except Exception as e:
-        logging.exception("Failed to log activity: %s", e)
+        logging.exception("Failed to log %d activities: %s", len(batch), e)
+        if conn is not None:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
     finally:
         if cur is not None:
             try:
@@ -42,6 +75,76 @@ def log_activity(user_id: Any, action: str, description: str) -> None:
                 pass
         if conn is not None:
             try:
-                conn.close()
+                release_db(conn)
             except Exception:
                 pass
+
+
+def _drain_nowait() -> List[tuple]:
+    rows = []
+    while True:
+        try:
+            row = _QUEUE.get_nowait()
+        except queue.Empty:
+            return rows
+        if row is not _STOP:
+            rows.append(row)
+
+
+def _writer_loop() -> None:
+    """
+    Wait for the first queued row, then collect more until the batch is
+    full or the flush interval has passed, and write them together.
+    """
+    while True:
+        row = _QUEUE.get()
+        stopping = row is _STOP
+        batch = [] if stopping else [row]
+
+        deadline = time.monotonic() + _FLUSH_INTERVAL_SEC
+        while not stopping and len(batch) < _BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                row = _QUEUE.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if row is _STOP:
+                stopping = True
+            else:
+                batch.append(row)
+
+        _write_batch(batch)
+
+        if stopping:
+            rest = _drain_nowait()
+            for i in range(0, len(rest), _BATCH_SIZE):
+                _write_batch(rest[i:i + _BATCH_SIZE])
+            return
+
+
+def start_activity_writer() -> None:
+    """
+    Start the background writer thread (FastAPI startup).
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(
+                target=_writer_loop, name="activity-log-writer", daemon=True
+            )
+            _writer.start()
+
+
+def stop_activity_writer(timeout: float = 5.0) -> None:
+    """
+    Flush everything still queued and stop the writer (FastAPI shutdown).
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            return
+        _QUEUE.put(_STOP)
+        _writer.join(timeout)
+        _writer = None
@@ -1,13 +1,68 @@
-from datetime import date
-from typing import Optional
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Optional, Tuple
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Depends
 
-from db import get_db
+from db import db_dep
 
 router = APIRouter(prefix="/activity-logs", tags=["Activity Logs"])
 
 
+# Bits of the filter mask used to pick a prebuilt query
+_F_USER = 1 << 0
+_F_ACTION = 1 << 1
+_F_SEARCH = 1 << 2
+_F_DATE_FROM = 1 << 3
+_F_DATE_TO = 1 << 4
+_F_KEYSET = 1 << 5
+
+
+@lru_cache(maxsize=32)
+def _build_sql(mask: int) -> Tuple[str, str]:
+    """
+    Build (count_sql, rows_sql) once per combination of active filters.
+    Date filters compare the raw timestamp so an index on it stays usable.
+    With _F_KEYSET the rows query seeks past a (timestamp, log_id) cursor
+    instead of using OFFSET.
+    """
+    where = []
+    if mask & _F_USER:
+        where.append("al.user_id = %s")
+    if mask & _F_ACTION:
+        where.append("al.action = %s")
+    if mask & _F_SEARCH:
+        where.append("al.description LIKE %s")
+    if mask & _F_DATE_FROM:
+        where.append("al.timestamp >= %s")
+    if mask & _F_DATE_TO:
+        where.append("al.timestamp < %s")
+    if mask & _F_KEYSET:
+        # Spelled out: MySQL won't range-scan a row-constructor "<"
+        where.append(
+            "(al.timestamp < %s OR (al.timestamp = %s AND al.log_id < %s))"
+        )
+
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+    count_sql = f"SELECT COUNT(*) AS cnt FROM activity_logs al {where_sql}"
+    rows_sql = f"""
+        SELECT
+            al.log_id   AS id,
+            al.user_id  AS user_id,
+            u.username  AS user_name,
+            al.action   AS action,
+            al.description,
+            al.timestamp
+        FROM activity_logs al
+        LEFT JOIN user u ON u.user_id = al.user_id
+        {where_sql}
+        ORDER BY al.timestamp DESC, al.log_id DESC
+        {"LIMIT %s" if mask & _F_KEYSET else "LIMIT %s OFFSET %s"}
+    """
+    return count_sql, rows_sql
+
+
 @router.get("")
 def list_activity_logs(
     page: int = Query(1, ge=1),
@@ -17,95 +72,103 @@ def list_activity_logs(
     search: Optional[str] = Query(None),
     date_from: Optional[date] = Query(None),
     date_to: Optional[date] = Query(None),
+    after_ts: Optional[datetime] = Query(None),
+    after_id: Optional[int] = Query(None),
+    conn=Depends(db_dep),
 ):
     """
     Paginated + filterable list of activity logs for ActivityLog.jsx.
+
+    Pass after_ts + after_id (the previous response's next_cursor) to get
+    the following page by keyset instead of page number; that skips the
+    COUNT and the OFFSET scan, so "total" is omitted.
     """
-    conn = get_db()
     cur = conn.cursor(dictionary=True)
 
     try:
-        where = []
+        mask = 0
         params = []
 
         if user_id is not None:
-            where.append("al.user_id = %s")
+            mask |= _F_USER
             params.append(user_id)
 
         if action:
-            where.append("al.action = %s")
+            mask |= _F_ACTION
             params.append(action)
 
         if search:
-            where.append("al.description LIKE %s")
+            mask |= _F_SEARCH
             params.append(f"%{search}%")
 
         if date_from:
-            where.append("DATE(al.timestamp) >= %s")
+            mask |= _F_DATE_FROM
             params.append(date_from)
 
         if date_to:
-            where.append("DATE(al.timestamp) <= %s")
-            params.append(date_to)
+            # inclusive end date -> exclusive next-day bound
+            mask |= _F_DATE_TO
+            params.append(date_to + timedelta(days=1))
 
-        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        keyset = after_ts is not None and after_id is not None
+        if keyset:
+            mask |= _F_KEYSET
 
-        # total
-        cur.execute(
-            f"SELECT COUNT(*) AS cnt FROM activity_logs al {where_sql}",
-            params,
-        )
-        total = cur.fetchone()["cnt"]
+        count_sql, rows_sql = _build_sql(mask)
 
-        offset = (page - 1) * page_size
+        if keyset:
+            cur.execute(rows_sql, params + [after_ts, after_ts, after_id, page_size])
+        else:
+            # total (no JOIN needed for the count)
+            cur.execute(count_sql, params)
+            total = cur.fetchone()["cnt"]
 
-        # rows
-        cur.execute(
-            f"""
-            SELECT
-                al.log_id   AS id,
-                al.user_id  AS user_id,
-                u.username  AS user_name,
-                al.action   AS action,
-                al.description,
-                al.timestamp
-            FROM activity_logs al
-            LEFT JOIN user u ON u.user_id = al.user_id
-            {where_sql}
-            ORDER BY al.timestamp DESC
-            LIMIT %s OFFSET %s
-            """,
-            params + [page_size, offset],
-        )
+            offset = (page - 1) * page_size
+
+            # rows
+            cur.execute(rows_sql, params + [page_size, offset])
         rows = cur.fetchall()
 
+        next_cursor = None
+        if len(rows) == page_size:
+            next_cursor = {"ts": rows[-1]["timestamp"], "id": rows[-1]["id"]}
+
+        if keyset:
+            return {
+                "data": rows,
+                "page_size": page_size,
+                "next_cursor": next_cursor,
+            }
+
         return {
             "data": rows,
             "total": total,
             "page": page,
             "page_size": page_size,
+            "next_cursor": next_cursor,
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cur.close()
-        conn.close()
 
 
 @router.get("/highlights")
 def list_highlight_activity_logs(
     limit: int = Query(20, ge=1, le=100),
+    conn=Depends(db_dep),
 ):
     """
     Lightweight feed used by dashboard widgets.
     Only returns authentication events, inventory add/delete/stock changes,
     and predictive restock runs.
     """
-    conn = get_db()
     cur = conn.cursor(dictionary=True)
 
     try:
+        # One LIMIT-bounded branch per kind of event, each served by the
+        # (action, timestamp) index; only the merged top rows join `user`.
         cur.execute(
             """
             SELECT
@@ -115,14 +178,32 @@ def list_highlight_activity_logs(
                 al.action      AS action,
                 al.description AS description,
                 al.timestamp   AS timestamp
-            FROM activity_logs al
+            FROM (
+                (SELECT log_id, user_id, action, description, timestamp
+                 FROM activity_logs
+                 WHERE action IN (%s, %s, %s)
+                 ORDER BY timestamp DESC
+                 LIMIT %s)
+                UNION ALL
+                (SELECT log_id, user_id, action, description, timestamp
+                 FROM activity_logs
+                 WHERE action = %s AND description LIKE %s
+                 ORDER BY timestamp DESC
+                 LIMIT %s)
+                UNION ALL
+                (SELECT log_id, user_id, action, description, timestamp
+                 FROM activity_logs
+                 WHERE action = %s AND description LIKE %s
+                 ORDER BY timestamp DESC
+                 LIMIT %s)
+                UNION ALL
+                (SELECT log_id, user_id, action, description, timestamp
+                 FROM activity_logs
+                 WHERE action = %s AND description LIKE %s
+                 ORDER BY timestamp DESC
+                 LIMIT %s)
+            ) al
             LEFT JOIN user u ON u.user_id = al.user_id
-            WHERE (
-                al.action IN (%s, %s, %s)
-                OR (al.action = %s AND al.description LIKE %s)
-                OR (al.action = %s AND al.description LIKE %s)
-                OR (al.action = %s AND al.description LIKE %s)
-            )
             ORDER BY al.timestamp DESC
             LIMIT %s
             """,
@@ -130,13 +211,17 @@ def list_highlight_activity_logs(
                 "Login",
                 "Logout",
                 "Predictive Restock",
+                limit,
                 "Create",
                 "Added inventory item%",
+                limit,
                 "Delete",
                 "Deleted inventory item%",
+                limit,
                 "Update",
                 "Updated inventory item%",
                 limit,
+                limit,
             ],
         )
         rows = cur.fetchall()
@@ -165,4 +250,3 @@ def list_highlight_activity_logs(
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cur.close()
-        conn.close()
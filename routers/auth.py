@@ -2,7 +2,7 @@ import logging
 import os
 
 from typing import Optional
-from fastapi import APIRouter, HTTPException, Form, Response, Cookie
+from fastapi import APIRouter, HTTPException, Form, Response, Cookie, Depends
 from pydantic import EmailStr
 import mysql.connector
 
@@ -10,8 +10,9 @@ from security.jwt_tools import sign_access, sign_refresh, verify_token
 from security.deps import COOKIE_NAME_AT, COOKIE_NAME_RT
 from routers.activity_logger import log_activity   # 👈 use helper
 
-from passlib.hash import argon2 as pwd  # keep your chosen hasher
-from db import get_db
+from security.passwords import pwd, DUMMY_HASH
+from db import db_dep
+from routers.users import _get_roles, _role_id_by_name, _role_id_exists
 
 router = APIRouter(tags=["auth"])
 COOKIE_DOMAIN = os.getenv("COOKIE_DOMAIN", "localhost")
@@ -52,6 +53,7 @@ def register(
     password: str = Form(...),
     role: Optional[str] = Form(None),
     roles_id: Optional[int] = Form(None),
+    conn=Depends(db_dep),
 ):
     if len(password) < 6:
         raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
@@ -62,54 +64,34 @@ def register(
         logging.exception("Hashing failed")
         raise HTTPException(status_code=500, detail=f"Hashing failed: {e}")
 
-    conn = get_db()
+    cursor = conn.cursor(dictionary=True)
     try:
-        cursor = conn.cursor(dictionary=True)
-
         logging.info(f"/register received role={role!r}, roles_id={roles_id!r}")
 
-        # Resolve role id
-        resolved_role_id = None
+        # Resolve the role from the cached roles table (refreshed through
+        # this cursor on a miss), so the insert is the only statement and
+        # the response carries the stored role name without a re-read.
         if roles_id is not None:
-            cursor.execute("SELECT role_name FROM roles WHERE roles_id=%s", (roles_id,))
-            r = cursor.fetchone()
-            if not r:
+            if not _role_id_exists(roles_id, cursor):
                 raise HTTPException(status_code=400, detail=f"Unknown roles_id: {roles_id}")
-            resolved_role_id = roles_id
+            rid = roles_id
         elif role:
-            role_clean = role.strip()
-            cursor.execute(
-                "SELECT roles_id FROM roles WHERE LOWER(TRIM(role_name)) = LOWER(%s)",
-                (role_clean,),
-            )
-            r = cursor.fetchone()
-            if not r:
+            rid = _role_id_by_name(role, cursor)
+            if rid is None:
                 raise HTTPException(status_code=400, detail=f"Unknown role: {role}")
-            resolved_role_id = r["roles_id"]
         else:
-            cursor.execute("SELECT roles_id FROM roles WHERE LOWER(role_name)='admin'")
-            r = cursor.fetchone()
-            resolved_role_id = r["roles_id"] if r else 1
-
-        logging.info(f"/register resolved_role_id={resolved_role_id}")
-
-        cursor.execute(
-            "INSERT INTO `user` (roles_id, username, email, password) VALUES (%s, %s, %s, %s)",
-            (resolved_role_id, username, email, hashed_pw),
-        )
-        conn.commit()
-        new_id = cursor.lastrowid
+            rid = _get_roles(cursor)["by_name"].get("admin", 1)
+        role_name = _get_roles(cursor)["by_id"].get(rid)
 
         cursor.execute(
             """
-            SELECT u.user_id, u.username, u.email, r.role_name
-            FROM `user` u
-            LEFT JOIN roles r ON r.roles_id = u.roles_id
-            WHERE u.user_id=%s
+            INSERT INTO `user` (roles_id, username, email, password)
+            VALUES (%s, %s, %s, %s)
             """,
-            (new_id,),
+            (rid, username, email, hashed_pw),
         )
-        row = cursor.fetchone()
+        conn.commit()
+        new_id = cursor.lastrowid
 
         # 🔔 ACTIVITY: created account
         log_activity(
@@ -121,10 +103,10 @@ def register(
         return {
             "message": "User registered successfully",
             "user": {
-                "id": row["user_id"],
-                "name": row["username"],
-                "email": row["email"],
-                "role": row["role_name"],
+                "id": new_id,
+                "name": username,
+                "email": email,
+                "role": role_name,
             },
         }
 
@@ -134,18 +116,19 @@ def register(
             raise HTTPException(status_code=409, detail="Email already exists")
         raise HTTPException(status_code=400, detail=f"MySQL error: {err}")
     finally:
-        try:
-            cursor.close()
-        except Exception:
-            pass
-        conn.close()
+        cursor.close()
 
 
 @router.post("/login")
-def login(resp: Response, username: str = Form(...), password: str = Form(...)):
-    conn = get_db()
+def login(
+    resp: Response,
+    username: str = Form(...),
+    password: str = Form(...),
+    conn=Depends(db_dep),
+):
+    # Single-row lookup: plain tuple cursor, unpacked by position
+    cur = conn.cursor()
     try:
-        cur = conn.cursor(dictionary=True)
         cur.execute(
             """
             SELECT u.user_id, u.username, u.email, u.password, r.role_name AS role
@@ -155,43 +138,43 @@ def login(resp: Response, username: str = Form(...), password: str = Form(...)):
             """,
             (username,),
         )
-        user = cur.fetchone()
+        row = cur.fetchone()
     finally:
-        try:
-            cur.close()
-        except Exception:
-            pass
-        conn.close()
+        cur.close()
 
-    if not user or not pwd.verify(password, user["password"]):
+    # Always run one verify so response time doesn't reveal unknown emails
+    ok = pwd.verify(password, row[3] if row else DUMMY_HASH)
+    if not row or not ok:
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
-    access, aexp = sign_access(user["user_id"], user["role"])
-    refresh, rexp = sign_refresh(user["user_id"], user["role"])
+    user_id, uname, email, _, role = row
+
+    access, aexp = sign_access(user_id, role)
+    refresh, rexp = sign_refresh(user_id, role)
 
     _set_cookie(resp, COOKIE_NAME_AT, access, aexp)
     _set_cookie(resp, COOKIE_NAME_RT, refresh, rexp)
 
     # 🔔 ACTIVITY: login
     log_activity(
-        user["user_id"],
+        user_id,
         "Login",
-        f"User {user['username']} logged in.",
+        f"User {uname} logged in.",
     )
 
     return {
         "message": "Login successful",
         "user": {
-            "id": user["user_id"],
-            "username": user["username"],
-            "email": user["email"],
-            "role": user["role"],
+            "id": user_id,
+            "username": uname,
+            "email": email,
+            "role": role,
         },
     }
 
 
 @router.post("/refresh")
-def refresh(resp: Response, refresh_token: str | None = Cookie(default=None, alias=COOKIE_NAME_RT)):
+async def refresh(resp: Response, refresh_token: str | None = Cookie(default=None, alias=COOKIE_NAME_RT)):
     if not refresh_token:
         raise HTTPException(status_code=401, detail="Missing refresh token")
     try:
@@ -212,7 +195,7 @@ def refresh(resp: Response, refresh_token: str | None = Cookie(default=None, ali
 
 
 @router.post("/logout")
-def logout(
+async def logout(
     resp: Response,
     access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT),
 ):
@@ -235,7 +218,7 @@ def logout(
 
 
 @router.get("/me")
-def me(access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT)):
+async def me(access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT)):
     if not access_token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     try:
@@ -1,73 +1,72 @@
-from fastapi import APIRouter, HTTPException
-from db import get_db
+from datetime import date
+
+from fastapi import APIRouter, Depends
+from db import db_dep
+from utils.dates import month_range
 
 router = APIRouter(tags=["Dashboard"])
 
 
 @router.get("/dashboard/top-items")
-def get_top_items(year: int, month: int | None = None):
+def get_top_items(year: int, month: int | None = None, conn=Depends(db_dep)):
     """
     Returns TOP 3 most sold items.
     If month is None → yearly
     If month is provided → monthly
     """
-    conn = get_db()
-    cursor = conn.cursor(dictionary=True)
-
+    # Range on transaction_date (not YEAR()/MONTH()) so an index can be used
     if month:
-        cursor.execute("""
-            SELECT i.name, SUM(ol.quantity) AS total_sold
-            FROM order_line ol
-            JOIN `order` o ON o.order_id = ol.order_id
-            JOIN item i ON i.item_id = ol.item_id
-            WHERE YEAR(o.transaction_date) = %s
-              AND MONTH(o.transaction_date) = %s
-            GROUP BY i.item_id
-            ORDER BY total_sold DESC
-            LIMIT 3
-        """, (year, month))
+        start, end = month_range(year, month)
     else:
-        cursor.execute("""
-            SELECT i.name, SUM(ol.quantity) AS total_sold
-            FROM order_line ol
-            JOIN `order` o ON o.order_id = ol.order_id
-            JOIN item i ON i.item_id = ol.item_id
-            WHERE YEAR(o.transaction_date) = %s
-            GROUP BY i.item_id
-            ORDER BY total_sold DESC
-            LIMIT 3
-        """, (year,))
+        start, end = date(year, 1, 1), date(year + 1, 1, 1)
+
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT i.name, SUM(ol.quantity) AS total_sold
+        FROM order_line ol
+        JOIN `order` o ON o.order_id = ol.order_id
+        JOIN item i ON i.item_id = ol.item_id
+        WHERE o.transaction_date >= %s
+          AND o.transaction_date < %s
+        GROUP BY i.item_id
+        ORDER BY total_sold DESC
+        LIMIT 3
+    """, (start, end))
 
     rows = cursor.fetchall()
     cursor.close()
-    conn.close()
 
     return {"top_items": rows}
 
 @router.get("/dashboard/sales")
-def get_sales(year: int):
+def get_sales(year: int, conn=Depends(db_dep)):
     """
     Returns monthly sales totals for given year.
+    Months without sales come back from SQL as 0.
     """
-    conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
     cursor.execute("""
-        SELECT MONTH(transaction_date) AS month, 
-               SUM(total_price) AS total
-        FROM `order`
-        WHERE YEAR(transaction_date) = %s
-        GROUP BY MONTH(transaction_date)
-        ORDER BY MONTH(transaction_date)
-    """, (year,))
+        WITH RECURSIVE months (m) AS (
+            SELECT 1
+            UNION ALL
+            SELECT m + 1 FROM months WHERE m < 12
+        )
+        SELECT months.m AS month,
+               COALESCE(s.total, 0) AS total
+        FROM months
+        LEFT JOIN (
+            SELECT MONTH(transaction_date) AS m,
+                   SUM(total_price) AS total
+            FROM `order`
+            WHERE transaction_date >= %s
+              AND transaction_date < %s
+            GROUP BY MONTH(transaction_date)
+        ) s ON s.m = months.m
+        ORDER BY months.m
+    """, (date(year, 1, 1), date(year + 1, 1, 1)))
 
     rows = cursor.fetchall()
     cursor.close()
-    conn.close()
-
-    # convert to full 12 months (fill missing with zero)
-    monthly = [{"month": m, "total": 0} for m in range(1,13)]
-    for row in rows:
-        monthly[row["month"]-1]["total"] = float(row["total"])
 
-    return {"sales": monthly}
\ No newline at end of file
+    return {"sales": [{"month": r["month"], "total": float(r["total"])} for r in rows]}
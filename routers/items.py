@@ -1,39 +1,31 @@
 # backend/routers/items.py
-from typing import Optional
-
-from fastapi import APIRouter, Form, Cookie
+from fastapi import APIRouter, Form, Cookie, Depends
 import mysql.connector
 
-from db import get_db
-from security.jwt_tools import verify_token
-from security.deps import COOKIE_NAME_AT
+from db import db_dep
+from utils.responses import FastJSONResponse
+from security.deps import COOKIE_NAME_AT, actor_id_from_token
 from routers.activity_logger import log_activity
+from services.stock_service import clear_stock_cache
 
 router = APIRouter(prefix="/items", tags=["Items"])
 
 
-def _actor_id_from_cookie(access_token: str | None) -> Optional[int]:
-    if not access_token:
-        return None
-    try:
-        claims = verify_token(access_token)
-        if claims.get("type") == "access":
-            return int(claims["sub"])
-    except Exception:
-        return None
-    return None
-
-
 # ✅ READ: Fetch all items
 @router.get("/")
-def get_items():
-    conn = get_db()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM item")
-    items = cursor.fetchall()
+def get_items(conn=Depends(db_dep)):
+    # Tuple rows + one column list, serialized straight to bytes by orjson
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT item_id, name, unit, category, price, stock_quantity, reorder_level
+        FROM item
+        """
+    )
+    cols = [c[0] for c in cursor.description]
+    rows = cursor.fetchall()
     cursor.close()
-    conn.close()
-    return items
+    return FastJSONResponse([dict(zip(cols, r)) for r in rows])
 
 
 # ✅ CREATE: Add a new item
@@ -46,8 +38,8 @@ def add_item(
     stock_quantity: int = Form(...),
     reorder_level: int = Form(...),
     access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT),
+    conn=Depends(db_dep),
 ):
-    conn = get_db()
     cursor = conn.cursor()
     try:
         cursor.execute(
@@ -58,15 +50,15 @@ def add_item(
             (name, unit, category, price, stock_quantity, reorder_level),
         )
         conn.commit()
+        clear_stock_cache()
         item_id = cursor.lastrowid
     except mysql.connector.Error:
         conn.rollback()
         raise
     finally:
         cursor.close()
-        conn.close()
 
-    actor_id = _actor_id_from_cookie(access_token)
+    actor_id = actor_id_from_token(access_token)
     log_activity(
         actor_id,
         "Create",
@@ -87,8 +79,8 @@ def update_item(
     stock_quantity: int = Form(...),
     reorder_level: int = Form(...),
     access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT),
+    conn=Depends(db_dep),
 ):
-    conn = get_db()
     cursor = conn.cursor()
     try:
         cursor.execute(
@@ -100,14 +92,14 @@ def update_item(
             (name, unit, category, price, stock_quantity, reorder_level, item_id),
         )
         conn.commit()
+        clear_stock_cache()
     except mysql.connector.Error:
         conn.rollback()
         raise
     finally:
         cursor.close()
-        conn.close()
 
-    actor_id = _actor_id_from_cookie(access_token)
+    actor_id = actor_id_from_token(access_token)
     log_activity(
         actor_id,
         "Update",
@@ -122,20 +114,20 @@ def update_item(
 def delete_item(
     item_id: int,
     access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT),
+    conn=Depends(db_dep),
 ):
-    conn = get_db()
     cursor = conn.cursor()
     try:
         cursor.execute("DELETE FROM item WHERE item_id=%s", (item_id,))
         conn.commit()
+        clear_stock_cache()
     except mysql.connector.Error:
         conn.rollback()
         raise
     finally:
         cursor.close()
-        conn.close()
 
-    actor_id = _actor_id_from_cookie(access_token)
+    actor_id = actor_id_from_token(access_token)
     log_activity(
         actor_id,
         "Delete",
@@ -151,12 +143,12 @@ def add_stock(
     item_id: int,
     added_qty: int = Form(...),
     access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT),
+    conn=Depends(db_dep),
 ):
     """
     Increment stock_quantity for an existing item.
     This is for 'add stock' operations (e.g., new delivery).
     """
-    conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
     try:
@@ -182,15 +174,15 @@ def add_stock(
             (new_stock, item_id),
         )
         conn.commit()
+        clear_stock_cache()
 
     except mysql.connector.Error:
         conn.rollback()
         raise
     finally:
         cursor.close()
-        conn.close()
 
-    actor_id = _actor_id_from_cookie(access_token)
+    actor_id = actor_id_from_token(access_token)
     log_activity(
         actor_id,
         "Update",  # or "Transaction" / "Stock Change" if you prefer
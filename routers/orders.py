@@ -1,42 +1,188 @@
-from datetime import date
-from fastapi import APIRouter, HTTPException
+import logging
+from typing import Dict, List
+
+from fastapi import APIRouter, Depends, HTTPException
 import mysql.connector
 
-from db import get_db
+from db import db_dep, get_db, release_db
 from schemas import ORPayload
+from services.stock_service import clear_stock_cache
+from utils.cache import ttl_cache
+from utils.dates import month_range
+from utils.responses import stream_rows
 
 router = APIRouter(tags=["Orders"])
 
 
-def _month_range(year: int, month: int):
+def _lock_items(cursor, lines: List[dict]) -> None:
+    """
+    Helper: lock the item rows used by `lines` in ascending item_id order
+    and copy each item's current stock_quantity onto its lines.
+
+    Every checkout takes its item locks in the same global order, so two
+    concurrent orders that share items queue instead of deadlocking.
+    """
+    item_ids = sorted({line["item_id"] for line in lines})
+    if not item_ids:
+        return
+
+    in_sql = ", ".join(["%s"] * len(item_ids))
+    cursor.execute(
+        f"""
+        SELECT item_id, stock_quantity
+        FROM item
+        WHERE item_id IN ({in_sql})
+        ORDER BY item_id
+        FOR UPDATE
+        """,
+        item_ids,
+    )
+    stock = {r["item_id"]: r["stock_quantity"] for r in cursor.fetchall()}
+    for line in lines:
+        line["stock_quantity"] = stock.get(line["item_id"], 0)
+
+
+def _deduct_stock(cursor, lines: List[dict]) -> None:
     """
-    Helper: given year & month, return (start_date, end_date) as Python date objects.
-    end_date is the first day of the next month (exclusive).
+    Helper: deduct order_line quantities from item stock in ONE statement.
+
+    Each item row is only updated if it still has enough stock, so the
+    stock check and the deduction are atomic; if any item is short,
+    rowcount comes back lower and we raise 409 (caller rolls back).
+    `lines` rows need item_id, quantity and stock_quantity.
     """
-    if month < 1 or month > 12:
-        raise HTTPException(status_code=400, detail="Month must be 1–12.")
+    qty_by_item: Dict[int, int] = {}
+    for line in lines:
+        if line["quantity"] > 0:
+            qty_by_item[line["item_id"]] = qty_by_item.get(line["item_id"], 0) + line["quantity"]
+    if not qty_by_item:
+        return
 
-    start = date(year, month, 1)
-    if month == 12:
-        end = date(year + 1, 1, 1)
-    else:
-        end = date(year, month + 1, 1)
+    case_sql = " ".join(["WHEN %s THEN %s"] * len(qty_by_item))
+    case_params = [v for pair in qty_by_item.items() for v in pair]
+    in_sql = ", ".join(["%s"] * len(qty_by_item))
 
-    return start, end
+    cursor.execute(
+        f"""
+        UPDATE item
+        SET stock_quantity = stock_quantity - CASE item_id {case_sql} END
+        WHERE item_id IN ({in_sql})
+          AND stock_quantity >= CASE item_id {case_sql} END
+        """,
+        case_params + list(qty_by_item) + case_params,
+    )
+
+    if cursor.rowcount != len(qty_by_item):
+        stock = {line["item_id"]: line["stock_quantity"] for line in lines}
+        short = next(
+            (i for i, q in qty_by_item.items() if stock.get(i, 0) < q),
+            next(iter(qty_by_item)),
+        )
+        raise HTTPException(
+            status_code=409,
+            detail=f"Insufficient stock for item {short}.",
+        )
+
+
+def _order_summary(row: dict, or_number, transaction_date) -> dict:
+    """
+    Helper: the updated-order payload, built from the locked order row
+    instead of re-reading it after commit.
+    """
+    return {
+        "order_id": row["order_id"],
+        "OR_number": or_number,
+        "customer_name": row["customer_name"],
+        "total_price": row["total_price"],
+        "transaction_date": transaction_date,
+        "username": row["username"],
+    }
+
+
+def check_report_table() -> None:
+    """
+    Startup check: add_or and /monthly-report need daily_order_line_report
+    in its migrations/005 (= 011) shape; fail fast instead of erroring per
+    request.
+    """
+    conn = get_db()
+    if conn is None:
+        logging.warning("daily_order_line_report not checked: database unavailable")
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            SELECT
+                COALESCE(SUM(column_name = 'unit_cost'), 0),
+                COALESCE(SUM(column_name = 'item_id'), 0)
+            FROM information_schema.columns
+            WHERE table_schema = DATABASE()
+              AND table_name = 'daily_order_line_report'
+            """
+        )
+        has_snapshot, has_item_id = cursor.fetchone()
+    finally:
+        cursor.close()
+        release_db(conn)
+    if not has_snapshot or has_item_id:
+        raise RuntimeError(
+            "daily_order_line_report is missing or outdated: "
+            "apply migrations/005 (and 011 if 010 was applied)"
+        )
+
+
+def _refresh_report_lines(cursor, order_id: int, replace: bool) -> None:
+    """
+    Helper: snapshot one non-Souvenir order's rows into
+    daily_order_line_report (what /monthly-report reads). Runs inside the
+    caller's transaction, after the order's OR_number / transaction_date
+    are set. Item unit/name/price are copied as they are now: later renames
+    or repricing don't change past reports. `replace` drops the rows of a
+    previous OR first.
+    """
+    if replace:
+        cursor.execute(
+            "DELETE FROM daily_order_line_report WHERE order_id = %s",
+            (order_id,),
+        )
+    cursor.execute(
+        """
+        INSERT INTO daily_order_line_report
+            (order_id, order_line_id, or_number, payer, date, qty_sold, unit,
+             description, unit_cost, total_cost)
+        SELECT
+            o.order_id,
+            ol.order_line_id,
+            o.OR_number,
+            o.customer_name,
+            o.transaction_date,
+            ol.quantity,
+            i.unit,
+            i.name,
+            i.price,
+            ol.quantity * i.price
+        FROM `order` o
+        JOIN order_line ol ON ol.order_id = o.order_id
+        JOIN item i ON i.item_id = ol.item_id
+        WHERE o.order_id = %s
+          AND o.OR_number IS NOT NULL
+        """,
+        (order_id,),
+    )
 
 
 # =====================================================================
 #  NORMAL POS TRANSACTIONS (EXCLUDES SOUVENIR / JOB ORDER TRANSACTIONS)
 # =====================================================================
 @router.get("/transactions")
-def get_transactions():
+def get_transactions(conn=Depends(db_dep)):
     """
     Return all transactions EXCEPT those that contain any item whose
     category = 'Souvenir'.
 
     Normal POS: these rely on OR_number to set transaction_date.
     """
-    conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
     cursor.execute(
@@ -63,7 +209,6 @@ def get_transactions():
     transactions = cursor.fetchall()
 
     cursor.close()
-    conn.close()
     return {"transactions": transactions}
 
 
@@ -71,14 +216,13 @@ def get_transactions():
 #  JOB ORDER TRANSACTIONS (ONLY ORDERS WITH SOUVENIR ITEMS)
 # =====================================================================
 @router.get("/job-orders/transactions")
-def get_job_order_transactions():
+def get_job_order_transactions(conn=Depends(db_dep)):
     """
     Return ONLY transactions that contain at least one item whose
     category = 'Souvenir' (regardless of OR_number).
 
     For these, transaction_date will be set by /orders/{id}/set_joborder_date.
     """
-    conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
     cursor.execute(
@@ -104,7 +248,6 @@ def get_job_order_transactions():
     transactions = cursor.fetchall()
 
     cursor.close()
-    conn.close()
     return {"transactions": transactions}
 
 
@@ -112,7 +255,7 @@ def get_job_order_transactions():
 #  NORMAL POS: ADD OR (NON-SOUVENIR ORDERS ONLY)
 # =====================================================================
 @router.post("/orders/{order_id}/add_or")
-def add_or(order_id: int, payload: ORPayload):
+def add_or(order_id: int, payload: ORPayload, conn=Depends(db_dep)):
     """
     Normal POS flow (NON–Souvenir orders):
 
@@ -130,63 +273,63 @@ def add_or(order_id: int, payload: ORPayload):
     - Orders that contain 'Souvenir' items will NOT have stock deducted here;
       they are handled in set_joborder_date instead.
     """
-    conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
     try:
-        conn.start_transaction()
+        # READ COMMITTED: the locking reads below take record locks only,
+        # no gap locks, so concurrent checkouts deadlock less
+        conn.start_transaction(isolation_level="READ COMMITTED")
 
-        # 0) Enforce OR uniqueness (only if OR_number is provided)
-        if payload.OR_number:
-            cursor.execute(
-                """
-                SELECT order_id
-                FROM `order`
-                WHERE OR_number = %s
-                  AND order_id <> %s
-                """,
-                (payload.OR_number, order_id),
-            )
-            dup = cursor.fetchone()
-            if dup:
-                raise HTTPException(status_code=400, detail="OR is not unique")
-
-        # 1) Lock order row
+        # 1) Lock order row; the same round-trip checks OR uniqueness and
+        #    whether this is a Souvenir order (subqueries are not locked),
+        #    and reads what the response summary needs
         cursor.execute(
-            "SELECT * FROM `order` WHERE order_id = %s FOR UPDATE",
-            (order_id,),
+            """
+            SELECT
+                o.order_id,
+                o.OR_number,
+                o.customer_name,
+                o.total_price,
+                (SELECT u.username FROM `user` u WHERE u.user_id = o.user_id) AS username,
+                NOW() AS now_ts,
+                EXISTS (
+                    SELECT 1
+                    FROM `order` o2
+                    WHERE o2.OR_number = %s
+                      AND o2.order_id <> o.order_id
+                ) AS or_taken,
+                EXISTS (
+                    SELECT 1
+                    FROM order_line ol
+                    JOIN item i ON i.item_id = ol.item_id
+                    WHERE ol.order_id = o.order_id
+                      AND i.category = 'Souvenir'
+                ) AS is_souvenir
+            FROM `order` o
+            WHERE o.order_id = %s
+            FOR UPDATE
+            """,
+            # an empty OR_number matches nothing, so it skips the uniqueness check
+            (payload.OR_number or None, order_id),
         )
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Order not found")
 
-        already_has_or = row.get("OR_number") is not None
+        # 1b) Enforce OR uniqueness (only if OR_number is provided)
+        if row["or_taken"]:
+            raise HTTPException(status_code=400, detail="OR is not unique")
 
-        # 1b) Check if this order is a Souvenir order (has any Souvenir item)
-        cursor.execute(
-            """
-            SELECT COUNT(*) AS cnt
-            FROM order_line ol
-            JOIN item i ON i.item_id = ol.item_id
-            WHERE ol.order_id = %s
-              AND i.category = 'Souvenir'
-            """,
-            (order_id,),
-        )
-        job_info = cursor.fetchone()
-        is_souvenir_order = bool(job_info and job_info["cnt"] > 0)
+        already_has_or = row.get("OR_number") is not None
+        is_souvenir_order = bool(row["is_souvenir"])
 
-        # 2) Get order lines + item stock, lock item rows
+        # 2) Get order lines (no lock; the order row is already locked)
         cursor.execute(
             """
-            SELECT
-                ol.item_id,
-                ol.quantity,
-                i.stock_quantity
-            FROM order_line ol
-            JOIN item i ON i.item_id = ol.item_id
-            WHERE ol.order_id = %s
-            FOR UPDATE
+            SELECT item_id, quantity
+            FROM order_line
+            WHERE order_id = %s
+            ORDER BY item_id
             """,
             (order_id,),
         )
@@ -195,55 +338,32 @@ def add_or(order_id: int, payload: ORPayload):
         # 3) If OR was NULL before AND this is NOT a Souvenir order,
         #    deduct stock now (normal POS behavior).
         if not already_has_or and not is_souvenir_order:
-            # Validate stock
-            for line in lines:
-                if line["stock_quantity"] < line["quantity"]:
-                    raise HTTPException(
-                        status_code=409,
-                        detail=f"Insufficient stock for item {line['item_id']}.",
-                    )
-
-            # Deduct stock
-            for line in lines:
-                cursor.execute(
-                    """
-                    UPDATE item
-                    SET stock_quantity = stock_quantity - %s
-                    WHERE item_id = %s
-                    """,
-                    (line["quantity"], line["item_id"]),
-                )
+            # Lock item rows in item_id order, then validate + deduct
+            # stock in one guarded UPDATE
+            _lock_items(cursor, lines)
+            _deduct_stock(cursor, lines)
 
         # 4) Update OR_number and transaction_date
         cursor.execute(
             """
             UPDATE `order`
             SET OR_number = %s,
-                transaction_date = NOW()
+                transaction_date = %s
             WHERE order_id = %s
             """,
-            (payload.OR_number, order_id),
+            (payload.OR_number, row["now_ts"], order_id),
         )
 
+        # 4b) Snapshot the monthly report rows
+        if not is_souvenir_order:
+            _refresh_report_lines(cursor, order_id, replace=already_has_or)
+
         conn.commit()
+        _dashboard_stats.cache_clear()
+        clear_stock_cache()
 
-        # 5) Return updated order summary
-        cursor.execute(
-            """
-            SELECT
-                o.order_id,
-                o.OR_number,
-                o.customer_name,
-                o.total_price,
-                o.transaction_date,
-                u.username
-            FROM `order` o
-            JOIN `user` u ON o.user_id = u.user_id
-            WHERE o.order_id = %s
-            """,
-            (order_id,),
-        )
-        updated = cursor.fetchone()
+        # 5) Return updated order summary (no re-read)
+        updated = _order_summary(row, payload.OR_number, row["now_ts"])
 
         return {"message": "OR updated", "order": updated}
 
@@ -255,14 +375,13 @@ def add_or(order_id: int, payload: ORPayload):
         raise HTTPException(status_code=500, detail=str(err))
     finally:
         cursor.close()
-        conn.close()
 
 
 # =====================================================================
 #  JOB ORDER FINALIZE: SOUVENIR ONLY
 # =====================================================================
 @router.post("/orders/{order_id}/set_joborder_date")
-def set_joborder_date(order_id: int):
+def set_joborder_date(order_id: int, conn=Depends(db_dep)):
     """
     SOUVENIR FLOW ONLY (JOB ORDER):
 
@@ -275,18 +394,26 @@ def set_joborder_date(order_id: int):
 
     Called immediately after Job Order "Save & Print".
     """
-    conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
     try:
-        conn.start_transaction()
+        # READ COMMITTED: the locking reads below take record locks only,
+        # no gap locks, so concurrent checkouts deadlock less
+        conn.start_transaction(isolation_level="READ COMMITTED")
 
         # 1) Lock order row to ensure it exists
         cursor.execute(
             """
-            SELECT order_id, transaction_date
-            FROM `order`
-            WHERE order_id = %s
+            SELECT
+                o.order_id,
+                o.OR_number,
+                o.customer_name,
+                o.total_price,
+                o.transaction_date,
+                (SELECT u.username FROM `user` u WHERE u.user_id = o.user_id) AS username,
+                NOW() AS now_ts
+            FROM `order` o
+            WHERE o.order_id = %s
             FOR UPDATE
             """,
             (order_id,),
@@ -297,19 +424,23 @@ def set_joborder_date(order_id: int):
 
         had_date_before = row["transaction_date"] is not None
 
-        # 2) Check it has at least one 'Souvenir' item
+        # 2) Get order lines with their category (no lock) and check
+        #    it has at least one 'Souvenir' item
         cursor.execute(
             """
-            SELECT COUNT(*) AS cnt
+            SELECT
+                ol.item_id,
+                ol.quantity,
+                i.category
             FROM order_line ol
             JOIN item i ON i.item_id = ol.item_id
             WHERE ol.order_id = %s
-              AND i.category = 'Souvenir'
+            ORDER BY ol.item_id
             """,
             (order_id,),
         )
-        info = cursor.fetchone()
-        if not info or info["cnt"] == 0:
+        job_lines = [l for l in cursor.fetchall() if l["category"] == "Souvenir"]
+        if not job_lines:
             raise HTTPException(
                 status_code=400,
                 detail="Order does not contain any 'Souvenir' items",
@@ -318,70 +449,28 @@ def set_joborder_date(order_id: int):
         # 3) If this is the FIRST time we finalize this Souvenir Order
         #    (transaction_date was NULL), deduct stock for Souvenir items.
         if not had_date_before:
-            cursor.execute(
-                """
-                SELECT
-                    ol.item_id,
-                    ol.quantity,
-                    i.stock_quantity
-                FROM order_line ol
-                JOIN item i ON i.item_id = ol.item_id
-                WHERE ol.order_id = %s
-                  AND i.category = 'Souvenir'
-                FOR UPDATE
-                """,
-                (order_id,),
-            )
-            job_lines = cursor.fetchall()
-
-            # Validate stock
-            for line in job_lines:
-                if line["stock_quantity"] < line["quantity"]:
-                    raise HTTPException(
-                        status_code=409,
-                        detail=f"Insufficient stock for item {line['item_id']}.",
-                    )
-
-            # Deduct stock
-            for line in job_lines:
-                cursor.execute(
-                    """
-                    UPDATE item
-                    SET stock_quantity = stock_quantity - %s
-                    WHERE item_id = %s
-                    """,
-                    (line["quantity"], line["item_id"]),
-                )
+            # Lock item rows in item_id order, then validate + deduct
+            # stock in one guarded UPDATE
+            _lock_items(cursor, job_lines)
+            _deduct_stock(cursor, job_lines)
 
         # 4) Update transaction_date ONLY if it's currently NULL
         cursor.execute(
             """
             UPDATE `order`
-            SET transaction_date = COALESCE(transaction_date, NOW())
+            SET transaction_date = COALESCE(transaction_date, %s)
             WHERE order_id = %s
             """,
-            (order_id,),
+            (row["now_ts"], order_id),
         )
 
         conn.commit()
+        clear_stock_cache()
 
-        # 5) Return updated order summary
-        cursor.execute(
-            """
-            SELECT
-                o.order_id,
-                o.OR_number,
-                o.customer_name,
-                o.total_price,
-                o.transaction_date,
-                u.username
-            FROM `order` o
-            JOIN `user` u ON o.user_id = u.user_id
-            WHERE o.order_id = %s
-            """,
-            (order_id,),
+        # 5) Return updated order summary (no re-read)
+        updated = _order_summary(
+            row, row["OR_number"], row["transaction_date"] or row["now_ts"]
         )
-        updated = cursor.fetchone()
 
         return {"message": "Souvenir Job Order finalized", "order": updated}
 
@@ -393,39 +482,40 @@ def set_joborder_date(order_id: int):
         raise HTTPException(status_code=500, detail=str(err))
     finally:
         cursor.close()
-        conn.close()
 
 
 # =====================================================================
 #  DELETE ORDER (ANY CATEGORY)
 # =====================================================================
 @router.delete("/orders/{order_id}")
-def delete_order(order_id: int):
+def delete_order(order_id: int, conn=Depends(db_dep)):
     """
     Delete an order (REGARDLESS of category).
     """
-    conn = get_db()
     cursor = conn.cursor()
 
     try:
-        cursor.execute(
-            "SELECT order_id FROM `order` WHERE order_id = %s",
-            (order_id,),
-        )
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Order not found")
+        conn.start_transaction()
 
+        # One round-trip: rowcount tells us whether the order existed
         cursor.execute(
             "DELETE FROM `order` WHERE order_id = %s",
             (order_id,),
         )
+        if cursor.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Order not found")
+
         conn.commit()
+        _dashboard_stats.cache_clear()
 
+    except HTTPException:
+        conn.rollback()
+        raise
     except mysql.connector.Error as err:
+        conn.rollback()
         raise HTTPException(status_code=500, detail=str(err))
     finally:
         cursor.close()
-        conn.close()
 
     return {"message": "Order deleted"}
 
@@ -442,50 +532,44 @@ def monthly_report(year: int, month: int):
     - OR_number IS NOT NULL (OR is the deciding factor)
     - EXCLUDES any order that has a Souvenir item
     - Each row is one order_line
+    - Read from daily_order_line_report (snapshot taken by add_or), no joins;
+      item details are as they were when the OR was set
     """
-    start_date, end_date = _month_range(year, month)
+    start_date, end_date = month_range(year, month)
 
+    # Not db_dep: the connection has to outlive this function while the
+    # rows stream out; stream_rows() closes it.
     conn = get_db()
-    cursor = conn.cursor(dictionary=True)
+    if conn is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    cursor = conn.cursor(dictionary=True, buffered=False)
 
     try:
         cursor.execute(
             """
             SELECT
-                o.order_id,
-                o.OR_number AS or_number,
-                o.customer_name AS payer,
-                o.transaction_date AS date,
-                ol.quantity AS qty_sold,
-                COALESCE(i.unit, 'pcs') AS unit,
-                i.name AS description,
-                i.price AS unit_cost,
-                (ol.quantity * i.price) AS total_cost
-            FROM `order` o
-            JOIN order_line ol ON ol.order_id = o.order_id
-            JOIN item i ON i.item_id = ol.item_id
-            WHERE o.transaction_date >= %s
-              AND o.transaction_date < %s
-              AND o.OR_number IS NOT NULL
-              AND NOT EXISTS (
-                  SELECT 1
-                  FROM order_line ol2
-                  JOIN item i2 ON i2.item_id = ol2.item_id
-                  WHERE ol2.order_id = o.order_id
-                    AND i2.category = 'Souvenir'
-              )
-            ORDER BY o.transaction_date, o.order_id, ol.order_line_id
+                order_id,
+                or_number,
+                payer,
+                date,
+                qty_sold,
+                unit,
+                description,
+                unit_cost,
+                total_cost
+            FROM daily_order_line_report
+            WHERE date >= %s
+              AND date < %s
+            ORDER BY date, order_id, order_line_id
             """,
             (start_date, end_date),
         )
-        rows = cursor.fetchall()
-        return {"rows": rows}
-
     except mysql.connector.Error as err:
-        raise HTTPException(status_code=500, detail=str(err))
-    finally:
         cursor.close()
-        conn.close()
+        release_db(conn)
+        raise HTTPException(status_code=500, detail=str(err))
+
+    return stream_rows(cursor, conn)
 
 
 # =====================================================================
@@ -501,10 +585,14 @@ def monthly_report_job_orders(year: int, month: int):
     - NO OR_number requirement
     - Each row is one order_line where item.category = 'Souvenir'
     """
-    start_date, end_date = _month_range(year, month)
+    start_date, end_date = month_range(year, month)
 
+    # Not db_dep: the connection has to outlive this function while the
+    # rows stream out; stream_rows() closes it.
     conn = get_db()
-    cursor = conn.cursor(dictionary=True)
+    if conn is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    cursor = conn.cursor(dictionary=True, buffered=False)
 
     try:
         cursor.execute(
@@ -514,7 +602,7 @@ def monthly_report_job_orders(year: int, month: int):
                 o.customer_name AS payer,
                 o.transaction_date AS date,
                 ol.quantity AS qty_sold,
-                COALESCE(i.unit, 'pcs') AS unit,
+                i.unit,
                 i.name AS description,
                 i.price AS unit_cost,
                 (ol.quantity * i.price) AS total_cost
@@ -523,52 +611,50 @@ def monthly_report_job_orders(year: int, month: int):
             JOIN item i ON i.item_id = ol.item_id
             WHERE o.transaction_date >= %s
               AND o.transaction_date < %s
-              AND EXISTS (
-                  SELECT 1
-                  FROM order_line ol2
-                  JOIN item i2 ON i2.item_id = ol2.item_id
-                  WHERE ol2.order_id = o.order_id
-                    AND i2.category = 'Souvenir'
-              )
+              -- a Souvenir line already proves the order is a Souvenir order
               AND i.category = 'Souvenir'
             ORDER BY o.transaction_date, o.order_id, ol.order_line_id
             """,
             (start_date, end_date),
         )
-        rows = cursor.fetchall()
-        return {"rows": rows}
-
     except mysql.connector.Error as err:
-        raise HTTPException(status_code=500, detail=str(err))
-    finally:
         cursor.close()
-        conn.close()
+        release_db(conn)
+        raise HTTPException(status_code=500, detail=str(err))
+
+    return stream_rows(cursor, conn)
 # ----------------- NEW DASHBOARD ENDPOINT -----------------
 # This is what your Dashboard will use.
-@router.get("/dashboard")
-def get_dashboard_stats():
+@ttl_cache(seconds=30)
+def _dashboard_stats() -> dict:
+    """
+    Dashboard payload, cached for 30s (cleared when an order is
+    completed or deleted).
+    """
     conn = get_db()
+    if conn is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
     cursor = conn.cursor(dictionary=True)
     try:
-        # 1) Total revenue from completed transactions (have OR_number)
-        cursor.execute("""
-            SELECT COALESCE(SUM(total_price), 0) AS total_revenue
-            FROM `order`
-            WHERE OR_number IS NOT NULL
-        """)
-        rev_row = cursor.fetchone() or {}
-        total_revenue = float(rev_row.get("total_revenue") or 0)
-
-        # 2) Total items sold (sum of quantities from order_line)
+        # 1) Total revenue + total items sold from completed transactions
+        #    (have OR_number), in one round-trip
         cursor.execute("""
-            SELECT COUNT(*) AS total_items_sold
-            FROM `order`
-            WHERE OR_number IS NOT NULL
+            SELECT
+                COALESCE(SUM(o.total_price), 0) AS total_revenue,
+                COALESCE((
+                    SELECT SUM(ol.quantity)
+                    FROM order_line ol
+                    JOIN `order` o2 ON o2.order_id = ol.order_id
+                    WHERE o2.OR_number IS NOT NULL
+                ), 0) AS total_items_sold
+            FROM `order` o
+            WHERE o.OR_number IS NOT NULL
         """)
-        items_row = cursor.fetchone() or {}
-        total_items_sold = int(items_row.get("total_items_sold") or 0)
+        totals = cursor.fetchone() or {}
+        total_revenue = float(totals.get("total_revenue") or 0)
+        total_items_sold = int(totals.get("total_items_sold") or 0)
 
-        # 3) Most sold items (top 5)
+        # 2) Most sold items (top 5)
         cursor.execute("""
             SELECT i.item_id, i.name, SUM(ol.quantity) AS total_sold
             FROM order_line ol
@@ -590,4 +676,9 @@ def get_dashboard_stats():
         raise HTTPException(status_code=500, detail=str(err))
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+        release_db(conn)
+
+
+@router.get("/dashboard")
+def get_dashboard_stats():
+    return _dashboard_stats()
@@ -2,6 +2,7 @@
 import math
 from typing import Optional
 
+import numpy as np
 from fastapi import APIRouter, HTTPException, Query, Cookie
 
 from utils.predict_core import (
@@ -10,27 +11,32 @@ from utils.predict_core import (
     forecast_with_prophet_df,
     forecast_with_moving_average,
     forecast_with_pretrained,
+    forecast_records,
+    pretrained_yhat_many,
     get_current_stock,
     model_items,
 )
 from db import get_db
-from security.jwt_tools import verify_token
-from security.deps import COOKIE_NAME_AT
+from security.deps import COOKIE_NAME_AT, actor_id_from_token
 from routers.activity_logger import log_activity
 
 router = APIRouter()
 
 
-def _actor_id_from_cookie(access_token: Optional[str]) -> Optional[int]:
-    if not access_token:
-        return None
-    try:
-        claims = verify_token(access_token)
-        if claims.get("type") == "access":
-            return int(claims["sub"])
-    except Exception:
-        return None
-    return None
+def _restock_summary(yhat: np.ndarray, current_stock: int) -> dict:
+    """
+    avg_daily / total_next_30 / recommended_restock from the forecast's yhat column.
+    """
+    avg_daily = round(float(yhat.mean()), 2) if yhat.size else 0.0
+    total_next_30 = round(float(yhat[:30].sum()), 2) if yhat.size else 0.0
+    safety_factor = 1.2
+    target_cover = math.ceil(total_next_30 * safety_factor)
+    recommended = max(0, target_cover - current_stock)
+    return {
+        "avg_daily": avg_daily,
+        "total_next_30": total_next_30,
+        "recommended_restock": int(recommended),
+    }
 
 
 @router.get("/predict/model_items")
@@ -47,20 +53,11 @@ def predict_forecast(
     if item_name is not None:
         fc = forecast_with_pretrained(item_name, horizon_days)
         current_stock = get_current_stock(item_id)  # 0 if None
-        avg_daily = round(sum(r["yhat"] for r in fc) / len(fc), 2) if fc else 0.0
-        total_next_30 = round(sum(r["yhat"] for r in fc[:30]), 2) if fc else 0.0
-        safety_factor = 1.2
-        target_cover = math.ceil(total_next_30 * safety_factor)
-        recommended = max(0, target_cover - current_stock)
         return {
             "item": {"id": item_id, "name": item_name},
             "current_stock": current_stock,
-            "forecast": fc,
-            "summary": {
-                "avg_daily": avg_daily,
-                "total_next_30": total_next_30,
-                "recommended_restock": int(recommended),
-            },
+            "forecast": forecast_records(fc),
+            "summary": _restock_summary(fc["yhat"].to_numpy(), current_stock),
         }
 
     if item_id is None:
@@ -78,23 +75,13 @@ def predict_forecast(
     else:
         fc = forecast_with_moving_average(hist, horizon_days)
 
-    avg_daily = round(sum(r["yhat"] for r in fc) / len(fc), 2) if fc else 0.0
-    total_next_30 = round(sum(r["yhat"] for r in fc[:30]), 2) if fc else 0.0
     current_stock = get_current_stock(item_id)
 
-    safety_factor = 1.2
-    target_cover = math.ceil(total_next_30 * safety_factor)
-    recommended = max(0, target_cover - current_stock)
-
     return {
         "item": {"id": item_id},
         "current_stock": current_stock,
-        "forecast": fc,
-        "summary": {
-            "avg_daily": avg_daily,
-            "total_next_30": total_next_30,
-            "recommended_restock": int(recommended),
-        },
+        "forecast": forecast_records(fc),
+        "summary": _restock_summary(fc["yhat"].to_numpy(), current_stock),
     }
 
 
@@ -116,29 +103,20 @@ def predict_forecast_all(
             detail="Pretrained file is a single model; no per-item list available.",
         )
 
+    # Items are forecast in parallel worker processes; only yhat comes back
     out = []
-    for name in names:
-        fc = forecast_with_pretrained(name, horizon_days)
-        avg_daily = round(sum(r["yhat"] for r in fc) / len(fc), 2) if fc else 0.0
-        total_next_30 = round(sum(r["yhat"] for r in fc[:30]), 2) if fc else 0.0
+    for name, yhat in zip(names, pretrained_yhat_many(names, horizon_days)):
         current_stock = 0  # unknown for pretrained; assume 0
-        safety_factor = 1.2
-        target_cover = math.ceil(total_next_30 * safety_factor)
-        recommended = max(0, target_cover - current_stock)
         out.append(
             {
                 "item_name": name,
-                "summary": {
-                    "avg_daily": avg_daily,
-                    "total_next_30": total_next_30,
-                    "recommended_restock": int(recommended),
-                },
+                "summary": _restock_summary(yhat, current_stock),
             }
         )
     out.sort(key=lambda r: r["summary"]["recommended_restock"], reverse=True)
 
     # 🔔 ACTIVITY
-    actor_id = _actor_id_from_cookie(access_token)
+    actor_id = actor_id_from_token(access_token)
     log_activity(
         actor_id,
         "Predictive Restock",
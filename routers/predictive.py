@@ -4,12 +4,9 @@ from fastapi.responses import FileResponse
 import os
 import pandas as pd
 
-from typing import Optional
-
-from db import get_db
-from security.jwt_tools import verify_token
-from security.deps import COOKIE_NAME_AT
+from security.deps import COOKIE_NAME_AT, actor_id_from_token
 from routers.activity_logger import log_activity
+from services.stock_service import get_stock_for_item, get_stock_map, get_stock_names
 
 from services.predictive_service import (
     DATA_FILE,
@@ -21,47 +18,17 @@ from services.predictive_service import (
     list_cached_models,
     forecast_next_6_months_for_itemname,
     forecast_next_month_safe,
+    forecast_next_month_from_monthly,
     recommended_restock_plan,
     export_month_plan,
+    export_all_plans,
+    all_item_plans,
     all_items_summary,
 )
 
 router = APIRouter(prefix="/predictive", tags=["Predictive"])
 
 
-def _actor_id_from_cookie(access_token: Optional[str]) -> Optional[int]:
-    if not access_token:
-        return None
-    try:
-        claims = verify_token(access_token)
-        if claims.get("type") == "access":
-            return int(claims["sub"])
-    except Exception:
-        return None
-    return None
-
-
-def _get_stock_from_db() -> pd.DataFrame:
-    """
-    Get current stock from MySQL `item` table and return DataFrame:
-      [item_name, stock_quantity]
-    Matching to CSV/Excel happens by item_name (case-insensitive).
-    """
-    conn = get_db()
-    cur = conn.cursor(dictionary=True)
-    cur.execute("SELECT name AS item_name, stock_quantity FROM item")
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    if not rows:
-        return pd.DataFrame(columns=["item_name", "stock_quantity"])
-
-    df = pd.DataFrame(rows)
-    df["item_name"] = df["item_name"].astype(str).str.strip()
-    return df
-
-
 # ----------------------- TRAIN / VALIDATE -----------------------
 
 @router.api_route("/train", methods=["GET", "POST"])
@@ -120,12 +87,7 @@ def forecast_one_item(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Data load failed: {e}")
 
-    stock_df = _get_stock_from_db()
-    stock_map = {
-        n.casefold(): int(q)
-        for n, q in zip(stock_df["item_name"], stock_df["stock_quantity"])
-    }
-    current_stock = stock_map.get(item_name.casefold(), 0)
+    current_stock = get_stock_for_item(item_name)
 
     try:
         monthly = forecast_next_6_months_for_itemname(hist, item_name)
@@ -153,8 +115,7 @@ def forecast_all_items():
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Data load failed: {e}")
 
-    stock_df = _get_stock_from_db()
-    table = all_items_summary(hist, stock_df)
+    table = all_items_summary(hist, get_stock_map())
 
     return {"count": int(len(table)), "rows": table.to_dict(orient="records")}
 
@@ -171,12 +132,7 @@ def export_item_plan(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Data load failed: {e}")
 
-    stock_df = _get_stock_from_db()
-    stock_map = {
-        n.casefold(): int(q)
-        for n, q in zip(stock_df["item_name"], stock_df["stock_quantity"])
-    }
-    current_stock = stock_map.get(item_name.casefold(), 0)
+    current_stock = get_stock_for_item(item_name)
 
     try:
         monthly = forecast_next_6_months_for_itemname(hist, item_name)
@@ -194,6 +150,25 @@ def export_item_plan(
     return FileResponse(path, media_type=media_type, filename=os.path.basename(path))
 
 
+@router.get("/export/all")
+def export_all_item_plans():
+    """
+    Every item's 6-month plan in one XLSX (one sheet per item).
+    """
+    try:
+        hist = load_history_from_excel()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Data load failed: {e}")
+
+    path = export_all_plans(all_item_plans(hist, get_stock_map()))
+
+    return FileResponse(
+        path,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        filename=os.path.basename(path),
+    )
+
+
 # ----------------------- NEXT-MONTH FORECAST ONLY -----------------------
 
 @router.get("/next_month/item")
@@ -205,12 +180,7 @@ def next_month_one_item(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Data load failed: {e}")
 
-    stock_df = _get_stock_from_db()
-    stock_map = {
-        n.casefold(): int(q)
-        for n, q in zip(stock_df["item_name"], stock_df["stock_quantity"])
-    }
-    current_stock = stock_map.get(item_name.casefold(), 0)
+    current_stock = get_stock_for_item(item_name)
 
     try:
         pred = forecast_next_month_safe(hist, item_name)
@@ -238,10 +208,11 @@ def next_month_all_items(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Data load failed: {e}")
 
-    stock_df = _get_stock_from_db()
-    if stock_df.empty:
+    db_key_to_name = get_stock_names()
+    db_key_to_stock = get_stock_map()
+    if not db_key_to_name:
         # still log that someone tried
-        actor_id = _actor_id_from_cookie(access_token)
+        actor_id = actor_id_from_token(access_token)
         log_activity(
             actor_id,
             "Predictive Restock",
@@ -249,26 +220,17 @@ def next_month_all_items(
         )
         return {"count": 0, "rows": []}
 
-    stock_df = stock_df.copy()
-    stock_df["key"] = stock_df["item_name"].astype(str).str.strip().str.casefold()
-
-    db_key_to_name = {k: n for k, n in zip(stock_df["key"], stock_df["item_name"])}
-    db_key_to_stock = {k: int(q) for k, q in zip(stock_df["key"], stock_df["stock_quantity"])}
-
-    def map_to_db_name(raw: str) -> str | None:
-        if raw is None:
-            return None
-        key = str(raw).strip().casefold()
-        if key in db_key_to_name:
-            return db_key_to_name[key]
-        return None
+    stock_keys = pd.DataFrame(
+        {"key": list(db_key_to_name), "canonical_name": list(db_key_to_name.values())}
+    )
 
-    hist = hist_raw.copy()
-    hist["canonical_name"] = hist["item_name"].apply(map_to_db_name)
-    hist = hist.dropna(subset=["canonical_name"])
+    # Map history names onto DB names with one join (unmatched rows drop out)
+    hist = hist_raw.assign(key=hist_raw["item_name"].str.strip().str.casefold()).merge(
+        stock_keys, on="key", how="inner"
+    )
 
     if hist.empty:
-        actor_id = _actor_id_from_cookie(access_token)
+        actor_id = actor_id_from_token(access_token)
         log_activity(
             actor_id,
             "Predictive Restock",
@@ -276,25 +238,22 @@ def next_month_all_items(
         )
         return {"count": 0, "rows": []}
 
-    hist["item_name"] = hist["canonical_name"]
     hist = (
-        hist.groupby(["date", "item_name"], as_index=False)["quantity"]
+        hist.groupby(["date", "canonical_name"], as_index=False)["quantity"]
         .sum()
-        .reset_index(drop=True)
+        .rename(columns={"canonical_name": "item_name"})
     )
 
-    stock_map = {
-        n.strip().casefold(): int(q)
-        for n, q in zip(stock_df["item_name"], stock_df["stock_quantity"])
-    }
+    # Aggregate + split per item once, instead of re-filtering for every item
+    groups = dict(list(to_monthly(hist).groupby("item_name", sort=False)))
 
     rows = []
-    for name in sorted(hist["item_name"].unique().tolist(), key=str.casefold):
+    for name in sorted(groups, key=str.casefold):
         try:
-            pred = forecast_next_month_safe(hist, name)
+            pred = forecast_next_month_from_monthly(groups[name], name)
         except Exception:
             continue
-        current = int(stock_map.get(name.strip().casefold(), 0))
+        current = int(db_key_to_stock.get(name.strip().casefold(), 0))
         rows.append(
             {
                 "item_name": name,
@@ -306,7 +265,7 @@ def next_month_all_items(
     rows.sort(key=lambda r: r["next_month_forecast"], reverse=True)
 
     # 🔔 ACTIVITY
-    actor_id = _actor_id_from_cookie(access_token)
+    actor_id = actor_id_from_token(access_token)
     log_activity(
         actor_id,
         "Predictive Restock",
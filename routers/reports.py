@@ -1,6 +1,8 @@
 import logging
 from fastapi import APIRouter, HTTPException, Query
-from db import get_db
+from db import get_db, release_db
+from utils.dates import month_range
+from utils.responses import stream_rows
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
 
@@ -14,15 +16,22 @@ def get_monthly_report(
     Monthly report based on ORDER + ORDER_LINE + ITEM.
 
     Rules:
-    - Always filter by YEAR/MONTH of transaction_date.
+    - Always filter by the month's [start, end) range on transaction_date.
     - Include ALL categories.
     - For NON-Souvenir items: OR_number must be real (NOT NULL, NOT '-').
     - For Souvenir items: OR_number is NOT required.
       -> In the result, Souvenir rows will ALWAYS show OR_number as '-'.
     Each row = one order_line.
     """
+    # Range on transaction_date (not YEAR()/MONTH()) so an index can be used
+    start, end = month_range(year, month)
+
+    # Not db_dep: the connection has to outlive this function while the
+    # rows stream out; stream_rows() closes it.
     conn = get_db()
-    cur = conn.cursor(dictionary=True)
+    if conn is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    cur = conn.cursor(dictionary=True, buffered=False)
 
     try:
         cur.execute(
@@ -31,7 +40,7 @@ def get_monthly_report(
                 DATE(o.transaction_date)      AS date,
                 o.customer_name               AS payer,
                 ol.quantity                   AS qty_sold,
-                COALESCE(i.unit, 'pcs')       AS unit,
+                i.unit                        AS unit,
                 i.name                        AS description,
                 i.price                       AS unit_cost,
                 (i.price * ol.quantity)       AS total_cost,
@@ -42,8 +51,8 @@ def get_monthly_report(
             FROM `order` o
             JOIN order_line ol ON ol.order_id = o.order_id
             JOIN item i        ON i.item_id = ol.item_id
-            WHERE YEAR(o.transaction_date) = %s
-              AND MONTH(o.transaction_date) = %s
+            WHERE o.transaction_date >= %s
+              AND o.transaction_date < %s
               AND (
                     (o.OR_number IS NOT NULL AND o.OR_number <> '-')
                     OR i.category = 'Souvenir'
@@ -52,16 +61,15 @@ def get_monthly_report(
                      o.order_id,
                      ol.order_line_id
             """,
-            (year, month),
+            (start, end),
         )
-        rows = cur.fetchall()
-        return {"rows": rows}
     except Exception as e:
         logging.exception("Error fetching monthly report")
-        raise HTTPException(status_code=500, detail=f"Server error: {e}")
-    finally:
         try:
             cur.close()
         except Exception:
             pass
-        conn.close()
+        release_db(conn)
+        raise HTTPException(status_code=500, detail=f"Server error: {e}")
+
+    return stream_rows(cur, conn)
@@ -1,16 +1,18 @@
 # backend/routers/sales.py
 
-from fastapi import APIRouter, HTTPException
-from db import get_db
+from fastapi import APIRouter, Depends, HTTPException
+from db import db_dep, get_db, release_db
 from schemas import SaleCreateIn
 
 router = APIRouter(prefix="/api/sales", tags=["Sales"])
 
+# Max order_line rows per INSERT (keeps statements well under max_allowed_packet)
+_LINE_CHUNK = 1000
+
 
 @router.get("/catalog")
-def get_catalog():
+def get_catalog(conn=Depends(db_dep)):
     """Minimal item list for selects."""
-    conn = get_db()
     cur = conn.cursor(dictionary=True)
 
     cur.execute(
@@ -23,7 +25,6 @@ def get_catalog():
     rows = cur.fetchall()
 
     cur.close()
-    conn.close()
     return rows
 
 
@@ -43,48 +44,61 @@ def create_sale(payload: SaleCreateIn):
     if not payload.items:
         raise HTTPException(status_code=400, detail="No items provided.")
 
-    if any(i.quantity <= 0 for i in payload.items):
-        raise HTTPException(status_code=400, detail="Quantities must be positive.")
-
+    # Not db_dep: FastAPI resolves dependencies before the body, so a bad
+    # cart would get a 503 while the DB is down. Borrow only after the
+    # payload has validated.
     conn = get_db()
-    cur = conn.cursor(dictionary=True)
+    if conn is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+
+    # Tuple rows, unpacked by position
+    cur = conn.cursor()
 
     try:
         conn.start_transaction()
 
-        # 1) Validate stock & compute total (but do NOT deduct yet)
+        # 1) Validate stock & compute total (but do NOT deduct yet):
+        #    one lookup for every item in the cart, plus the user check.
+        #    Plain consistent read, no row locks: nothing is written to
+        #    `item` here, and add_or / set_joborder_date re-check stock
+        #    under lock with a guarded UPDATE when they deduct it.
+        ids = sorted({it.item_id for it in payload.items})
+        in_sql = ", ".join(["%s"] * len(ids))
+        cur.execute(
+            f"""
+            SELECT
+                item_id,
+                price,
+                stock_quantity,
+                (SELECT 1 FROM `user` WHERE user_id = %s) AS user_ok
+            FROM item
+            WHERE item_id IN ({in_sql})
+            """,
+            (payload.user_id, *ids),
+        )
+        # (item_id, price, stock_quantity, user_ok) by item_id
+        by_id = {r[0]: r for r in cur.fetchall()}
+
         total = 0.0
         for it in payload.items:
-            cur.execute(
-                """
-                SELECT item_id, price, stock_quantity
-                FROM item
-                WHERE item_id = %s
-                FOR UPDATE
-                """,
-                (it.item_id,),
-            )
-            row = cur.fetchone()
+            row = by_id.get(it.item_id)
             if not row:
                 raise HTTPException(
                     status_code=404,
                     detail=f"Item {it.item_id} not found.",
                 )
 
-            if row["stock_quantity"] < it.quantity:
+            _, price, stock_quantity, _ = row
+            if stock_quantity < it.quantity:
                 raise HTTPException(
                     status_code=409,
                     detail=f"Insufficient stock for item {it.item_id}.",
                 )
 
-            total += float(row["price"]) * it.quantity
+            total += float(price) * it.quantity
 
-        # 2) Validate user_id
-        cur.execute(
-            "SELECT user_id FROM `user` WHERE user_id = %s",
-            (payload.user_id,),
-        )
-        if not cur.fetchone():
+        # 2) Validate user_id (every item row carries the same user_ok)
+        if not next(iter(by_id.values()))[3]:
             raise HTTPException(
                 status_code=400, detail=f"Invalid user_id {payload.user_id}"
             )
@@ -100,14 +114,15 @@ def create_sale(payload: SaleCreateIn):
         )
         order_id = cur.lastrowid
 
-        # 4) Insert lines (NO stock update here)
-        for it in payload.items:
+        # 4) Insert lines (NO stock update here): one multi-row INSERT
+        #    per _LINE_CHUNK lines
+        lines = [(order_id, it.item_id, it.quantity) for it in payload.items]
+        for i in range(0, len(lines), _LINE_CHUNK):
+            chunk = lines[i:i + _LINE_CHUNK]
             cur.execute(
-                """
-                INSERT INTO order_line (order_id, item_id, quantity)
-                VALUES (%s, %s, %s)
-                """,
-                (order_id, it.item_id, it.quantity),
+                "INSERT INTO order_line (order_id, item_id, quantity) VALUES "
+                + ", ".join(["(%s, %s, %s)"] * len(chunk)),
+                [v for line in chunk for v in line],
             )
 
         conn.commit()
@@ -115,7 +130,7 @@ def create_sale(payload: SaleCreateIn):
         return {
             "sale_id": order_id,
             "total_price": round(total, 2),
-            "items": [i.dict() for i in payload.items],
+            "items": [i.model_dump() for i in payload.items],
         }
 
     except HTTPException:
@@ -130,25 +145,27 @@ def create_sale(payload: SaleCreateIn):
             cur.close()
         except Exception:
             pass
-        conn.close()
+        release_db(conn)
 
 
 @router.get("/{sale_id}")
-def get_sale(sale_id: int):
+def get_sale(sale_id: int, conn=Depends(db_dep)):
     """Fetch a sale header + lines."""
-    conn = get_db()
     cur = conn.cursor(dictionary=True)
 
     # Quote `order` because it's reserved
     cur.execute(
-        "SELECT * FROM `order` WHERE order_id = %s",
+        """
+        SELECT order_id, user_id, transaction_date, total_price, OR_number, customer_name
+        FROM `order`
+        WHERE order_id = %s
+        """,
         (sale_id,),
     )
     order = cur.fetchone()
 
     if not order:
         cur.close()
-        conn.close()
         raise HTTPException(status_code=404, detail="Sale not found.")
 
     cur.execute(
@@ -168,6 +185,5 @@ def get_sale(sale_id: int):
     lines = cur.fetchall()
 
     cur.close()
-    conn.close()
 
     return {"order": order, "lines": lines}
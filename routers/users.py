@@ -1,14 +1,14 @@
 import logging
-from typing import List, Optional
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException, Path, Cookie
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
 import mysql.connector
 
-from db import get_db
+from db import db_dep, get_db, release_db
 from schemas import UserOut, UpdateUserIn, RoleOut
-from passlib.hash import argon2 as pwd
-from security.jwt_tools import verify_token
-from security.deps import COOKIE_NAME_AT
+from security.passwords import pwd
+from security.deps import get_current_claims
 from routers.activity_logger import log_activity
 
 router = APIRouter(tags=["Users"])
@@ -23,31 +23,96 @@ def _map_user_row(row: dict) -> UserOut:
     )
 
 
-def _actor_id_from_cookie(access_token: str | None) -> Optional[int]:
-    if not access_token:
-        return None
-    try:
-        claims = verify_token(access_token)
-        if claims.get("type") == "access":
-            return int(claims["sub"])
-    except Exception:
-        return None
-    return None
+# The whole (tiny) roles table, cached for 60s: (expires_at, roles)
+_ROLES_TTL_SEC = 60.0
+_ROLES_CACHE: Optional[Tuple[float, Dict[str, dict]]] = None
+
+
+def _read_roles(cursor) -> Dict[str, dict]:
+    """
+    {"by_id": {roles_id: role_name}, "by_name": {normalized name: roles_id}}
+    read with a dictionary cursor.
+    """
+    cursor.execute("SELECT roles_id, role_name FROM roles ORDER BY roles_id")
+    rows = cursor.fetchall()
+    return {
+        "by_id": {r["roles_id"]: r["role_name"] for r in rows},
+        "by_name": {
+            (r["role_name"] or "").strip().lower(): r["roles_id"] for r in rows
+        },
+    }
+
+
+def _get_roles(cursor=None, refresh: bool = False) -> Dict[str, dict]:
+    """
+    Cached roles; pass refresh=True (e.g. a lookup missed) to re-read now.
+    Handlers that already hold a connection pass their (dictionary) cursor,
+    so a cache miss never borrows a second pooled connection.
+    """
+    global _ROLES_CACHE
+    cached = _ROLES_CACHE
+    if not refresh and cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+
+    if cursor is not None:
+        roles = _read_roles(cursor)
+    else:
+        conn = get_db()
+        if conn is None:
+            raise HTTPException(status_code=503, detail="Database unavailable")
+        try:
+            own = conn.cursor(dictionary=True)
+            try:
+                roles = _read_roles(own)
+            finally:
+                own.close()
+        finally:
+            release_db(conn)
+
+    _ROLES_CACHE = (time.monotonic() + _ROLES_TTL_SEC, roles)
+    return roles
+
+
+def _role_id_by_name(name: str, cursor=None) -> Optional[int]:
+    key = name.strip().lower()
+    roles_id = _get_roles(cursor)["by_name"].get(key)
+    if roles_id is None:
+        # maybe added since the last refresh
+        roles_id = _get_roles(cursor, refresh=True)["by_name"].get(key)
+    return roles_id
+
+
+def _role_id_exists(roles_id: int, cursor=None) -> bool:
+    if roles_id in _get_roles(cursor)["by_id"]:
+        return True
+    return roles_id in _get_roles(cursor, refresh=True)["by_id"]
 
 
 @router.get("/users", response_model=List[UserOut])
-def list_users():
-    conn = get_db()
+def list_users(
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    after_id: int = Query(0, ge=0),
+    conn=Depends(db_dep),
+):
+    """
+    All users by default. Pass `limit` (and the last user_id seen as
+    `after_id`) to page through them by primary key.
+    """
+    sql = """
+        SELECT u.user_id, u.username, u.email, r.role_name
+        FROM `user` u
+        LEFT JOIN roles r ON r.roles_id = u.roles_id
+        WHERE u.user_id > %s
+        ORDER BY u.user_id ASC
+    """
+    params: list = [after_id]
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+
     try:
         cursor = conn.cursor(dictionary=True)
-        cursor.execute(
-            """
-            SELECT u.user_id, u.username, u.email, r.role_name
-            FROM `user` u
-            LEFT JOIN roles r ON r.roles_id = u.roles_id
-            ORDER BY u.user_id ASC
-            """
-        )
+        cursor.execute(sql, tuple(params))
         rows = cursor.fetchall()
         return [_map_user_row(r) for r in rows]
     finally:
@@ -55,28 +120,50 @@ def list_users():
             cursor.close()
         except Exception:
             pass
-        conn.close()
 
 
 @router.put("/users/{user_id}", response_model=UserOut)
 def update_user(
     user_id: int = Path(..., ge=1),
     body: Optional[UpdateUserIn] = None,
-    access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT),
+    claims: Dict[str, Any] = Depends(get_current_claims),
 ):
     if body is None:
         raise HTTPException(status_code=400, detail="No fields to update")
 
+    # Hash first: argon2 is the slow part of this request, so it runs
+    # before we borrow a connection (not db_dep) or lock the user row.
+    hashed_pw = None
+    if body.password is not None and body.password != "":
+        if len(body.password) < 6:
+            raise HTTPException(
+                status_code=400,
+                detail="Password must be at least 6 characters",
+            )
+        try:
+            hashed_pw = pwd.hash(body.password)
+        except Exception as e:
+            logging.exception("Hashing failed")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Hashing failed: {e}",
+            )
+
     conn = get_db()
+    if conn is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
     try:
         cursor = conn.cursor(dictionary=True)
+        conn.start_transaction()
 
-        # Check user exists
+        # Check user exists (and lock it until the UPDATE commits);
+        # the locked row is also the base of the response
         cursor.execute(
-            "SELECT user_id FROM `user` WHERE user_id=%s",
+            "SELECT user_id, username, email, roles_id FROM `user` WHERE user_id=%s FOR UPDATE",
             (user_id,),
         )
-        if not cursor.fetchone():
+        row = cursor.fetchone()
+        if not row:
             raise HTTPException(status_code=404, detail="User not found")
 
         set_parts: list[str] = []
@@ -86,57 +173,34 @@ def update_user(
         if body.username is not None and body.username.strip():
             set_parts.append("username=%s")
             params.append(body.username.strip())
+            row["username"] = body.username.strip()
 
         # email
         if body.email is not None:
             set_parts.append("email=%s")
             params.append(body.email)
+            row["email"] = body.email
 
-        # password
-        if body.password is not None and body.password != "":
-            if len(body.password) < 6:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Password must be at least 6 characters",
-                )
-            try:
-                hashed_pw = pwd.hash(body.password)
-            except Exception as e:
-                logging.exception("Hashing failed")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Hashing failed: {e}",
-                )
+        # password (hashed above)
+        if hashed_pw is not None:
             set_parts.append("password=%s")
             params.append(hashed_pw)
 
-        # role (by role name)
+        # role (by role name), resolved from the cached roles table
         if body.role is not None:
-            cursor.execute(
-                """
-                SELECT roles_id
-                FROM roles
-                WHERE LOWER(TRIM(role_name)) = LOWER(%s)
-                """,
-                (body.role.strip(),),
-            )
-            r = cursor.fetchone()
-            if not r:
+            roles_id = _role_id_by_name(body.role, cursor)
+            if roles_id is None:
                 raise HTTPException(
                     status_code=400,
                     detail=f"Unknown role: {body.role}",
                 )
             set_parts.append("roles_id=%s")
-            params.append(r["roles_id"])
+            params.append(roles_id)
+            row["roles_id"] = roles_id
 
         # roles_id (by id)
         if body.roles_id is not None:
-            cursor.execute(
-                "SELECT role_name FROM roles WHERE roles_id=%s",
-                (body.roles_id,),
-            )
-            r = cursor.fetchone()
-            if not r:
+            if not _role_id_exists(body.roles_id, cursor):
                 raise HTTPException(
                     status_code=400,
                     detail=f"Unknown roles_id: {body.roles_id}",
@@ -148,6 +212,7 @@ def update_user(
             else:
                 set_parts.append("roles_id=%s")
                 params.append(body.roles_id)
+            row["roles_id"] = body.roles_id
 
         if not set_parts:
             raise HTTPException(status_code=400, detail="Nothing to update")
@@ -158,30 +223,25 @@ def update_user(
         cursor.execute(sql, tuple(params))
         conn.commit()
 
-        # Return updated row
-        cursor.execute(
-            """
-            SELECT u.user_id, u.username, u.email, r.role_name
-            FROM `user` u
-            LEFT JOIN roles r ON r.roles_id = u.roles_id
-            WHERE u.user_id=%s
-            """,
-            (user_id,),
-        )
-        row = cursor.fetchone()
+        # Return updated row: the locked row merged with what we just wrote,
+        # role name from the cache (no re-SELECT / JOIN on roles)
+        row["role_name"] = _get_roles(cursor)["by_id"].get(row["roles_id"])
 
         # 🔔 ACTIVITY: updated account
-        actor_id = _actor_id_from_cookie(access_token)
         log_activity(
-            actor_id,
+            int(claims["sub"]),
             "Update",
             f"Updated account user_id={user_id}.",
         )
 
         return _map_user_row(row)
 
+    except HTTPException:
+        conn.rollback()
+        raise
     except mysql.connector.Error as err:
         logging.exception("DB error")
+        conn.rollback()
         if getattr(err, "errno", None) == 1062:
             raise HTTPException(status_code=409, detail="Email already exists")
         raise HTTPException(status_code=400, detail=f"MySQL error: {err}")
@@ -190,15 +250,15 @@ def update_user(
             cursor.close()
         except Exception:
             pass
-        conn.close()
+        release_db(conn)
 
 
 @router.delete("/users/{user_id}", status_code=204)
 def delete_user(
     user_id: int = Path(..., ge=1),
-    access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT),
+    claims: Dict[str, Any] = Depends(get_current_claims),
+    conn=Depends(db_dep),
 ):
-    conn = get_db()
     try:
         cursor = conn.cursor(dictionary=True)
 
@@ -217,9 +277,8 @@ def delete_user(
         conn.commit()
 
         # 🔔 ACTIVITY: deleted account
-        actor_id = _actor_id_from_cookie(access_token)
         log_activity(
-            actor_id,
+            int(claims["sub"]),
             "Delete",
             f"Deleted account user_id={user_id} ({row['username']}).",
         )
@@ -230,20 +289,11 @@ def delete_user(
             cursor.close()
         except Exception:
             pass
-        conn.close()
 
 
 @router.get("/roles", response_model=List[RoleOut])
 def list_roles():
-    conn = get_db()
-    try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT roles_id, role_name FROM roles ORDER BY roles_id")
-        rows = cursor.fetchall()
-        return [RoleOut(id=row["roles_id"], name=row["role_name"]) for row in rows]
-    finally:
-        try:
-            cursor.close()
-        except Exception:
-            pass
-        conn.close()
+    return [
+        RoleOut(roles_id=roles_id, role_name=role_name)
+        for roles_id, role_name in _get_roles()["by_id"].items()
+    ]
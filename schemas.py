@@ -1,5 +1,5 @@
 from typing import Optional, List
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, ConfigDict, Field, EmailStr, field_validator
 
 # ---- User/Role ----
 class UserOut(BaseModel):
@@ -27,10 +27,21 @@ class ORPayload(BaseModel):
 
 # ---- Sales ----
 class SaleItemIn(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     item_id: int
     quantity: int
 
+    @field_validator("quantity")
+    @classmethod
+    def _positive_quantity(cls, v: int) -> int:
+        if v <= 0:
+            raise ValueError("Quantities must be positive.")
+        return v
+
 class SaleCreateIn(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+
     user_id: int
     customer_name: str
     OR_number: Optional[str] = None
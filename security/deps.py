@@ -16,11 +16,27 @@ def get_current_claims(access_token: Optional[str] = Cookie(default=None, alias=
         raise HTTPException(status_code=401, detail="Wrong token type")
     return claims
 
+def actor_id_from_token(access_token: Optional[str]) -> Optional[int]:
+    """
+    user_id for activity logging, or None if the cookie is missing/invalid.
+    verify_token's decode is cached per token, so this is cheap on hot paths.
+    """
+    if not access_token:
+        return None
+    try:
+        claims = verify_token(access_token)
+        if claims.get("type") == "access":
+            return int(claims["sub"])
+    except Exception:
+        return None
+    return None
+
 def require_roles(allowed: List[str]):
-    allowed_norm = [r.strip().lower() for r in allowed]
+    # normalized once per route; frozenset membership is O(1) per request
+    is_allowed = frozenset(r.strip().lower() for r in allowed).__contains__
     def _checker(claims: Dict[str, Any] = Depends(get_current_claims)) -> Dict[str, Any]:
         role = (claims.get("role") or "").strip().lower()
-        if role not in allowed_norm:
+        if not is_allowed(role):
             raise HTTPException(status_code=403, detail="Forbidden")
         return claims
     return _checker
@@ -1,5 +1,8 @@
+import hashlib
 import os
-from datetime import datetime, timedelta, timezone
+import threading
+import time
+from collections import OrderedDict
 from typing import Tuple, Dict, Any
 from jose import jwt, JWTError
 
@@ -8,22 +11,59 @@ ALGO = "HS256"
 ACCESS_MIN = int(os.getenv("ACCESS_TOKEN_TTL_MIN", "15"))
 REFRESH_DAYS = int(os.getenv("REFRESH_TOKEN_TTL_DAYS", "7"))
 
-def _exp_in(minutes: int) -> int:
-    return int((datetime.now(timezone.utc) + timedelta(minutes=minutes)).timestamp())
+# Token lifetimes in seconds; exp is plain epoch arithmetic (UTC by definition)
+_ACCESS_SEC = ACCESS_MIN * 60
+_REFRESH_SEC = REFRESH_DAYS * 86400
 
-def _exp_days(days: int) -> int:
-    return int((datetime.now(timezone.utc) + timedelta(days=days)).timestamp())
+def _exp_after(seconds: int) -> int:
+    return int(time.time()) + seconds
 
 def sign_access(user_id: int, role: str) -> Tuple[str, int]:
-    payload = {"sub": str(user_id), "role": role, "type": "access", "exp": _exp_in(ACCESS_MIN)}
+    payload = {"sub": str(user_id), "role": role, "type": "access", "exp": _exp_after(_ACCESS_SEC)}
     return jwt.encode(payload, JWT_SECRET, algorithm=ALGO), payload["exp"]
 
 def sign_refresh(user_id: int, role: str) -> Tuple[str, int]:
-    payload = {"sub": str(user_id), "role": role, "type": "refresh", "exp": _exp_days(REFRESH_DAYS)}
+    payload = {"sub": str(user_id), "role": role, "type": "refresh", "exp": _exp_after(_REFRESH_SEC)}
     return jwt.encode(payload, JWT_SECRET, algorithm=ALGO), payload["exp"]
 
+# Verified claims by token digest (LRU). The digest is keyed with the secret,
+# so entries from another JWT_SECRET can never match.
+_DECODE_CACHE_MAX = 4096
+_DECODE_CACHE: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+_DECODE_LOCK = threading.Lock()
+_DIGEST_KEY = hashlib.blake2b(JWT_SECRET.encode(), digest_size=32).digest()
+
+
+def _token_digest(token: str) -> bytes:
+    # 16 bytes per entry instead of the whole compact JWT
+    return hashlib.blake2b(token.encode(), digest_size=16, key=_DIGEST_KEY).digest()
+
+
+def _decode_cached(token: str) -> Dict[str, Any]:
+    # Only successful decodes are cached; failures raise and are not stored.
+    key = _token_digest(token)
+    with _DECODE_LOCK:
+        claims = _DECODE_CACHE.get(key)
+        if claims is not None:
+            _DECODE_CACHE.move_to_end(key)
+            return claims
+
+    claims = jwt.decode(token, JWT_SECRET, algorithms=[ALGO])
+    with _DECODE_LOCK:
+        _DECODE_CACHE[key] = claims
+        if len(_DECODE_CACHE) > _DECODE_CACHE_MAX:
+            _DECODE_CACHE.popitem(last=False)
+    return claims
+
+
 def verify_token(token: str) -> Dict[str, Any]:
     try:
-        return jwt.decode(token, JWT_SECRET, algorithms=[ALGO])
+        claims = _decode_cached(token)
     except JWTError as e:
         raise ValueError(str(e))
+    # A cached token may have expired since it was first verified
+    exp = claims.get("exp")
+    if exp is not None and exp <= time.time():
+        raise ValueError("Signature has expired.")
+    return dict(claims)
+
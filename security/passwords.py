@@ -0,0 +1,9 @@
+from passlib.hash import argon2
+
+# OWASP baseline for Argon2id (19 MiB, 2 passes, 1 lane) instead of
+# passlib's 64 MiB / 4 lanes default. Existing hashes still verify:
+# their own parameters are stored in the hash string.
+pwd = argon2.using(memory_cost=19456, time_cost=2, parallelism=1)
+
+# Checked on logins for unknown emails so they cost the same as real ones.
+DUMMY_HASH = pwd.hash("dummy-password")
@@ -1,11 +1,20 @@
 # backend/services/predictive_service.py
 from __future__ import annotations
 
-import math
+import importlib.util
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
 import pandas as pd
+import joblib
+import numpy as np
+from joblib import Parallel, delayed
 from prophet import Prophet
 
 # -----------------------------------
@@ -18,23 +27,83 @@ EXPORT_DIR = Path(__file__).resolve().parents[1] / "exports"
 EXPORT_DIR.mkdir(parents=True, exist_ok=True)
 
 # -----------------------------------
-# Simple in-memory model cache
+# Simple in-memory model cache (persisted to EXPORT_DIR by /train/all)
 # -----------------------------------
 ITEM_MODELS: Dict[str, Prophet] = {}  # key: item_name (lowercase), value: trained Prophet
+# Same keys: the model's next-6-months prediction ['ds', 'yhat'], made once at fit time
+ITEM_FORECASTS: Dict[str, pd.DataFrame] = {}
+MODELS_FILE = EXPORT_DIR / "item_models.joblib"
+
+
+def _source_mtime_ns(path: Path = DATA_FILE) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def save_item_models(path: Path = MODELS_FILE) -> None:
+    """
+    Write ITEM_MODELS (+ ITEM_FORECASTS) to disk, tagged with the history
+    file's mtime so a newer history file invalidates them.
+    """
+    tmp = path.with_suffix(".tmp")
+    joblib.dump(
+        {
+            "source_mtime_ns": _source_mtime_ns(),
+            "models": dict(ITEM_MODELS),
+            "forecasts": dict(ITEM_FORECASTS),
+        },
+        tmp,
+        compress=3,
+    )
+    tmp.replace(path)  # atomic: readers never see a half-written file
+
+
+def load_item_models(path: Path = MODELS_FILE) -> int:
+    """
+    Fill ITEM_MODELS from disk if the saved models were trained on the
+    current history file. Returns the number of models loaded.
+    """
+    try:
+        saved = joblib.load(path)
+    except Exception:
+        return 0
+    if saved.get("source_mtime_ns") != _source_mtime_ns():
+        return 0
+    ITEM_MODELS.update(saved["models"])
+    ITEM_FORECASTS.update(saved.get("forecasts", {}))
+    return len(saved["models"])
+
+
+# warm start: reuse the last /train/all instead of refitting per worker
+load_item_models()
 
 
 # -----------------------------------
 # Readers (CSV/XLSX/XLS)
 # -----------------------------------
+# python-calamine (Rust) reads xlsx/xls many times faster than openpyxl/xlrd;
+# optional, pandas >= 2.2 uses it as engine="calamine".
+_HAS_CALAMINE = importlib.util.find_spec("python_calamine") is not None
+# pyarrow (optional) lets the cleaned history be kept as a Parquet sidecar
+_HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+# xlsxwriter (optional) writes .xlsx much faster than openpyxl
+_XLSX_ENGINE = "xlsxwriter" if importlib.util.find_spec("xlsxwriter") else "openpyxl"
+
+
 def _read_excel_with_engine(path: Path) -> pd.DataFrame:
     """
     Read dataset whether it's CSV, XLS, or XLSX.
-    Automatically picks the right reader.
+    Automatically picks the right reader (calamine when installed).
     """
     ext = path.suffix.lower()
 
     if ext == ".csv":
         return pd.read_csv(path)
+    elif _HAS_CALAMINE and ext in (".xlsx", ".xlsm", ".xltx", ".xltm", ".xls"):
+        # pip install python-calamine
+        return pd.read_excel(path, engine="calamine")
     elif ext in (".xlsx", ".xlsm", ".xltx", ".xltm"):
         # pip install openpyxl
         return pd.read_excel(path, engine="openpyxl")
@@ -51,6 +120,9 @@ def _read_excel_with_engine(path: Path) -> pd.DataFrame:
 # -----------------------------------
 # Robust date parser
 # -----------------------------------
+_ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
 def _parse_dates_safely(s: pd.Series) -> pd.Series:
     """
     Robust date parsing:
@@ -61,10 +133,18 @@ def _parse_dates_safely(s: pd.Series) -> pd.Series:
     if pd.api.types.is_datetime64_any_dtype(s):
         return s
 
-    d1 = pd.to_datetime(s, errors="coerce", infer_datetime_format=True, dayfirst=False)
+    # ISO dates (YYYY-MM-DD...) are unambiguous: one fixed-format pass,
+    # kept only if it parsed every value
+    sample = s.dropna().head(5)
+    if len(sample) and all(_ISO_DATE.match(str(x)) for x in sample):
+        d = pd.to_datetime(s, errors="coerce", format="ISO8601", cache=True)
+        if d.isna().sum() == s.isna().sum():
+            return d
+
+    d1 = pd.to_datetime(s, errors="coerce", infer_datetime_format=True, dayfirst=False, cache=True)
     frac_nat = d1.isna().mean()
     if frac_nat > 0.2:
-        d2 = pd.to_datetime(s, errors="coerce", infer_datetime_format=True, dayfirst=True)
+        d2 = pd.to_datetime(s, errors="coerce", infer_datetime_format=True, dayfirst=True, cache=True)
         return d2 if d2.isna().mean() < frac_nat else d1
     return d1
 
@@ -82,10 +162,61 @@ def load_history_from_excel(
     """
     Returns a clean DataFrame with columns:
       [date (datetime.date), item_name (str), quantity (int)]
+
+    The parsed frame is cached until the file's mtime changes, so every
+    caller shares it: copy before mutating.
     """
     if not path.exists():
         raise FileNotFoundError(f"Sales history file not found: {path}")
 
+    return _load_history_cached(path, path.stat().st_mtime_ns, items_col, date_col, qty_col)
+
+
+@lru_cache(maxsize=4)
+def _load_history_cached(
+    path: Path,
+    mtime_ns: int,
+    items_col: str,
+    date_col: str,
+    qty_col: str,
+) -> pd.DataFrame:
+    """
+    Parse + clean the history file. `mtime_ns` is only part of the cache key,
+    so a modified file is re-read on the next call.
+
+    With pyarrow installed the cleaned frame is also written next to the
+    source (<name>.clean.parquet), stamped with the source mtime and column
+    names, so a restarted process reads typed columns instead of re-parsing.
+    """
+    stamp = {"source_mtime_ns": mtime_ns, "columns": [items_col, date_col, qty_col]}
+    sidecar = path.with_suffix(".clean.parquet")
+
+    if _HAS_PYARROW and sidecar.exists():
+        try:
+            df = pd.read_parquet(sidecar, engine="pyarrow")
+            if df.attrs.get("history") == stamp:
+                df.attrs = {}
+                return df
+        except Exception:
+            pass  # unreadable/stale sidecar: rebuild it below
+
+    df = _clean_history(path, items_col, date_col, qty_col)
+
+    if _HAS_PYARROW:
+        tmp = sidecar.with_suffix(".tmp")
+        try:
+            df.attrs = {"history": stamp}  # pandas stores attrs in the parquet metadata
+            df.to_parquet(tmp, engine="pyarrow", index=False)
+            tmp.replace(sidecar)
+        except Exception as e:
+            logging.warning("Could not write %s: %s", sidecar, e)
+        finally:
+            df.attrs = {}
+
+    return df
+
+
+def _clean_history(path: Path, items_col: str, date_col: str, qty_col: str) -> pd.DataFrame:
     df = _read_excel_with_engine(path)
 
     # normalize headers (case/whitespace agnostic)
@@ -113,14 +244,44 @@ def load_history_from_excel(
 
     # ensure date-only column, then group
     df["date"] = df["date"].dt.date
-    df = df.groupby(["date", "item_name"], as_index=False)["quantity"].sum()
+    if _HAS_PYARROW:
+        df = _sum_by_date_item_arrow(df)
+    else:
+        df = df.groupby(["date", "item_name"], as_index=False)["quantity"].sum()
 
     return df  # columns: date, item_name, quantity
 
 
+def _sum_by_date_item_arrow(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    groupby(["date", "item_name"])["quantity"].sum() done by Arrow's hash
+    aggregation (no Python-object keys); same columns and row order.
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df[["date", "item_name", "quantity"]], preserve_index=False)
+    out = (
+        table.group_by(["date", "item_name"])
+        .aggregate([("quantity", "sum")])
+        .sort_by([("date", "ascending"), ("item_name", "ascending")])
+    )
+    return pd.DataFrame(
+        {
+            "date": out.column("date").to_pandas(),
+            "item_name": out.column("item_name").to_pandas(),
+            "quantity": out.column("quantity_sum").to_pandas(),
+        }
+    )
+
+
 # -----------------------------------
 # Monthly aggregation & eligibility
 # -----------------------------------
+# Last (history_df, monthly) pair; the forecast helpers call to_monthly()
+# once per item on the same history frame.
+_MONTHLY_MEMO: Optional[Tuple[pd.DataFrame, pd.DataFrame]] = None
+
+
 def to_monthly(history_df: pd.DataFrame) -> pd.DataFrame:
     """
     Convert daily history to monthly totals per item.
@@ -128,7 +289,15 @@ def to_monthly(history_df: pd.DataFrame) -> pd.DataFrame:
       - 'month' is pandas.Period('M')
       - 'ds' is Month Start timestamp (required by Prophet)
       - 'y' is monthly quantity
+
+    The result for the most recent history_df is reused (identity check),
+    so neither frame should be mutated in place.
     """
+    global _MONTHLY_MEMO
+    memo = _MONTHLY_MEMO
+    if memo is not None and memo[0] is history_df:
+        return memo[1]
+
     df = history_df.copy()
     df["date"] = pd.to_datetime(df["date"])
     df["month"] = df["date"].dt.to_period("M")  # IMPORTANT: just "M", not "MS"
@@ -139,7 +308,40 @@ def to_monthly(history_df: pd.DataFrame) -> pd.DataFrame:
         .reset_index(drop=True)
     )
     monthly["ds"] = monthly["month"].dt.to_timestamp(how="start")  # month start
-    return monthly  # item_name, month, y, ds
+    # case-insensitive item key; categorical so per-item groupbys hash
+    # small integer codes instead of strings (always group with observed=True)
+    monthly["_key"] = monthly["item_name"].str.casefold().astype("category")
+    _MONTHLY_MEMO = (history_df, monthly)
+    return monthly  # item_name, month, y, ds, _key
+
+
+# Last (monthly, groups) pair, same identity check as _MONTHLY_MEMO.
+_GROUPS_MEMO: Optional[Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]] = None
+
+
+def monthly_groups(monthly: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Split to_monthly() output per item: {casefolded item_name: its rows}.
+    Built once per monthly frame, so item lookups are a dict get
+    instead of a casefold + mask over every row.
+    """
+    global _GROUPS_MEMO
+    memo = _GROUPS_MEMO
+    if memo is not None and memo[0] is monthly:
+        return memo[1]
+
+    groups = dict(list(monthly.groupby("_key", sort=False, observed=True)))
+    _GROUPS_MEMO = (monthly, groups)
+    return groups
+
+
+def _item_monthly(history_df: pd.DataFrame, item_name: str) -> pd.DataFrame:
+    """
+    One item's monthly rows (matched case-insensitively); empty if unknown.
+    """
+    monthly = to_monthly(history_df)
+    item_df = monthly_groups(monthly).get(item_name.casefold())
+    return monthly.iloc[0:0] if item_df is None else item_df
 
 
 def eligible_items(monthly_df: pd.DataFrame, min_months: int = 12, min_sum: int = 10) -> List[str]:
@@ -148,9 +350,11 @@ def eligible_items(monthly_df: pd.DataFrame, min_months: int = 12, min_sum: int
       eligible if months >= 12 OR total y >= 10
     Returns a list of item_name strings (original casing).
     """
-    agg = monthly_df.groupby("item_name")["y"].agg(count="count", total="sum").reset_index()
-    elig = agg[(agg["count"] >= min_months) | (agg["total"] >= min_sum)]
-    return elig["item_name"].tolist()
+    by_item = monthly_df.groupby("item_name")["y"]
+    counts = by_item.size()  # to_monthly rows: one per month, y never NaN
+    totals = by_item.sum()
+    mask = (counts.to_numpy() >= min_months) | (totals.to_numpy() >= min_sum)
+    return counts.index[mask].tolist()
 
 
 # -----------------------------------
@@ -166,13 +370,15 @@ def _fit_monthly_prophet(monthly_item_df: pd.DataFrame) -> Prophet:
       - multiplicative seasonality (good for scale changes)
       - moderate changepoint_prior_scale
     """
-    # Ensure one row per month (in case of duplicates)
-    monthly_item_df = (
-        monthly_item_df
-        .groupby(pd.Grouper(key="ds", freq="MS"))["y"]
-        .sum()
-        .reset_index()
-    )
+    # Ensure one row per month (in case of duplicates); to_monthly() groups
+    # already have that, so they skip the regroup
+    if not monthly_item_df["ds"].is_unique:
+        monthly_item_df = (
+            monthly_item_df
+            .groupby(pd.Grouper(key="ds", freq="MS"))["y"]
+            .sum()
+            .reset_index()
+        )
 
     m = Prophet(
         yearly_seasonality=True,
@@ -180,31 +386,164 @@ def _fit_monthly_prophet(monthly_item_df: pd.DataFrame) -> Prophet:
         daily_seasonality=False,
         seasonality_mode="multiplicative",
         changepoint_prior_scale=0.2,
+        uncertainty_samples=0,  # only yhat is used; skip interval sampling in predict
     )
     m.fit(monthly_item_df[["ds", "y"]])
     return m
 
 
+def _predict_6_months(model: Prophet) -> pd.DataFrame:
+    """
+    The model's forecast for the 6 months after its history: ['ds', 'yhat'].
+    """
+    future = model.make_future_dataframe(periods=6, freq="MS", include_history=False)
+    return model.predict(future)[["ds", "yhat"]]
+
+
+def _fit_and_predict(monthly_item_df: pd.DataFrame) -> Tuple[Prophet, pd.DataFrame]:
+    model = _fit_monthly_prophet(monthly_item_df)
+    return model, _predict_6_months(model)
+
+
+# Items being fitted in the background after a forecast cache miss.
+_REFIT_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prophet-refit")
+_REFITTING: Set[str] = set()
+_REFIT_LOCK = threading.Lock()
+
+
+def _refit(key: str, item_df: pd.DataFrame) -> None:
+    try:
+        model, fc = _fit_and_predict(item_df[["ds", "y"]])
+        ITEM_MODELS[key] = model
+        ITEM_FORECASTS[key] = fc
+    except Exception as e:
+        logging.warning("Background Prophet fit failed for %r: %s", key, e)
+    finally:
+        with _REFIT_LOCK:
+            _REFITTING.discard(key)
+
+
+def _enqueue_refit(key: str, item_df: pd.DataFrame) -> None:
+    with _REFIT_LOCK:
+        if key in _REFITTING:
+            return
+        _REFITTING.add(key)
+    _REFIT_POOL.submit(_refit, key, item_df)
+
+
+def _cached_forecast(key: str, item_df: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """
+    6-month ['ds', 'yhat'] for an item. Both horizons (next month / 6 months)
+    read from it. With no model yet, the fit is queued in the background
+    (a request never waits for Stan) and None is returned: callers serve
+    the moving-average fallback until the model is ready.
+    """
+    fc = ITEM_FORECASTS.get(key)
+    if fc is None:
+        model = ITEM_MODELS.get(key)
+        if model is None:
+            _enqueue_refit(key, item_df)
+            return None
+        fc = _predict_6_months(model)
+        ITEM_FORECASTS[key] = fc
+    return fc
+
+
+# Below this many months a NumPy trend + seasonality fit replaces Prophet:
+# a handful of points doesn't need Stan, and it takes microseconds.
+_FAST_MAX_MONTHS = 36
+
+_TREND_DAMPING = 0.8  # Holt-style damped trend: step h adds slope * sum(phi^1..phi^h)
+_TREND_CAP = 0.25     # trend moves the forecast at most +-25% of the recent level
+_FLOOR_FRAC = 0.5     # below half the recent level -> use the recent level
+
+
+def _fast_monthly_forecast(t: np.ndarray, y: np.ndarray, horizon: int) -> np.ndarray:
+    """
+    Recent level + damped, capped linear trend + additive month-of-year index.
+    t: monthly Period ordinals of the observations (gaps allowed, ascending);
+    returns yhat for the `horizon` months after t[-1].
+
+    Short, gappy, noisy series: the level is the mean of the last 6 observed
+    months, a seasonal offset is used only for calendar months seen at least
+    twice, and a forecast far below the recent level falls back to it.
+    """
+    x = (t - t[0]).astype(float)
+    recent = float(y[-6:].mean())
+    slope, intercept = np.polyfit(x, y, 1) if len(x) > 1 else (0.0, float(y[0]))
+
+    steps = np.arange(1, horizon + 1)
+    phi = _TREND_DAMPING
+    trend = slope * phi * (1 - phi ** steps) / (1 - phi)
+    trend = np.clip(trend, -_TREND_CAP * recent, _TREND_CAP * recent)
+
+    resid = y - (slope * x + intercept)
+    moy = t % 12  # ordinal 0 = 1970-01, so this is the calendar month
+    counts = np.bincount(moy, minlength=12)
+    season = np.where(
+        counts >= 2,
+        np.bincount(moy, weights=resid, minlength=12) / np.maximum(counts, 1),
+        0.0,
+    )
+
+    yhat = recent + trend + season[(t[-1] + steps) % 12]
+    return np.where(yhat < _FLOOR_FRAC * recent, recent, yhat)
+
+
+def _item_forecast(key: str, item_df: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """
+    6-month ['ds', 'yhat'] for an item with >= 12 months: the NumPy model
+    for shorter series, the (cached) Prophet forecast for long ones
+    (None while that model is still being fitted).
+    """
+    item_df = item_df.dropna(subset=["y"])
+    if len(item_df) >= _FAST_MAX_MONTHS:
+        return _cached_forecast(key, item_df)
+
+    months = pd.PeriodIndex(item_df["month"], freq="M")
+    yhat = _fast_monthly_forecast(months.asi8, item_df["y"].to_numpy(dtype=float), 6)
+    ds = pd.period_range(months[-1] + 1, periods=6, freq="M").to_timestamp(how="start")
+    return pd.DataFrame({"ds": ds, "yhat": yhat})
+
+
 def train_models_for_eligible_items(history_df: pd.DataFrame) -> Tuple[List[str], List[str]]:
     """
-    Train and cache (in-memory) Prophet models for all ELIGIBLE items, per your rule.
+    Train and cache (in-memory + MODELS_FILE) Prophet models for all ELIGIBLE items, per your rule.
     Returns (trained_items, skipped_items).
+    Items with fewer than _FAST_MAX_MONTHS months are skipped: their
+    forecasts never use Prophet (fallback / _fast_monthly_forecast).
+
+    Fits are independent and CPU-bound, so they run in worker processes
+    (TRAIN_WORKERS, default: all cores); each worker also makes the
+    6-month prediction that forecasts are served from.
     """
     monthly = to_monthly(history_df)
     names = eligible_items(monthly)
 
-    trained, skipped = [], []
+    groups = monthly_groups(monthly)
+
+    jobs, skipped = [], []
     for name in names:
-        item_df = monthly.loc[monthly["item_name"].str.casefold() == name.casefold()].copy()
-        # Guard: Prophet needs >= 2 non-NaN rows
-        if item_df["y"].dropna().shape[0] < 2:
+        item_df = groups[name.casefold()]
+        # Guard: Prophet needs >= 2 non-NaN rows; and forecasts only read
+        # Prophet models for items with _FAST_MAX_MONTHS+ months
+        if item_df["y"].dropna().shape[0] < _FAST_MAX_MONTHS:
             skipped.append(name)
             continue
+        jobs.append((name, item_df[["ds", "y"]]))
+
+    workers = int(os.getenv("TRAIN_WORKERS", os.cpu_count() or 1))
+    results = Parallel(n_jobs=max(1, min(workers, len(jobs) or 1)), backend="loky")(
+        delayed(_fit_and_predict)(item_df) for _, item_df in jobs
+    )
 
-        model = _fit_monthly_prophet(item_df[["ds", "y"]])
+    trained = []
+    for (name, _), (model, fc) in zip(jobs, results):
         ITEM_MODELS[name.casefold()] = model
+        ITEM_FORECASTS[name.casefold()] = fc
         trained.append(name)
 
+    save_item_models()
     return trained, skipped
 
 
@@ -228,27 +567,45 @@ def fallback_next_month(item_df: pd.DataFrame) -> int:
     - If < 3 non-zero months → use last non-zero month
     - Always return int ≥ 0
     """
-    recent = item_df[item_df["y"] > 0].tail(3)["y"].tolist()
+    y = item_df["y"].to_numpy(dtype=float)
+    recent = y[np.flatnonzero(y > 0)[-3:]]  # last (up to) 3 non-zero months
 
-    if len(recent) == 0:
+    if recent.size == 0:
         return 0
-    if len(recent) < 3:
-        return int(round(recent[-1]))
+    if recent.size < 3:
+        return int(np.rint(recent[-1]))
+
+    return int(np.rint(recent.mean()))
+
 
-    return int(round(sum(recent) / len(recent)))
+def fallback_bases(monthly: pd.DataFrame) -> pd.Series:
+    """
+    fallback_next_month for every item of a to_monthly() frame at once.
+    Returns an int Series indexed by _key (items with no non-zero month
+    are missing: their fallback is 0).
+    """
+    recent = monthly[monthly["y"] > 0].groupby("_key", sort=False, observed=True).tail(3)
+    agg = recent.groupby("_key", sort=False, observed=True)["y"].agg(["mean", "count", "last"])
+    base = np.where(agg["count"] < 3, agg["last"], agg["mean"])
+    return pd.Series(np.round(base).astype(int), index=agg.index)
 
 
 def forecast_next_month_safe(history_df: pd.DataFrame, item_name: str) -> int:
     """
     Returns ONLY next month's forecast (integer).
-    Uses Prophet only if data is rich enough (>= 12 months).
+    Uses a model only if data is rich enough (>= 12 months; Prophet from 36).
     Otherwise uses a safe moving-average fallback.
 
     This is what powers /predictive/next_month endpoints.
     """
-    monthly = to_monthly(history_df)
-    item_df = monthly.loc[monthly["item_name"].str.casefold() == item_name.casefold()].copy()
+    return forecast_next_month_from_monthly(_item_monthly(history_df, item_name), item_name)
+
 
+def forecast_next_month_from_monthly(item_df: pd.DataFrame, item_name: str) -> int:
+    """
+    Same as forecast_next_month_safe, but takes the item's monthly rows
+    (one group of to_monthly()) so bulk callers filter the history only once.
+    """
     if item_df.empty:
         return 0
 
@@ -260,19 +617,14 @@ def forecast_next_month_safe(history_df: pd.DataFrame, item_name: str) -> int:
         return fallback_next_month(item_df)
 
     # Try Prophet for richer histories
-    key = item_name.casefold()
-    model = ITEM_MODELS.get(key)
-
     try:
-        if model is None:
-            model = _fit_monthly_prophet(item_df[["ds", "y"]])
-            ITEM_MODELS[key] = model
-
-        future = model.make_future_dataframe(periods=1, freq="MS", include_history=False)
-        fc = model.predict(future)
+        fc = _item_forecast(item_name.casefold(), item_df)
+        if fc is None:
+            # model not trained yet (fitting in the background)
+            return fallback_next_month(item_df)
 
         # yhat might be float; clip & round
-        next_month_pred = max(0, int(round(float(fc["yhat"].iloc[-1]))))
+        next_month_pred = max(0, int(round(float(fc["yhat"].iloc[0]))))
         return next_month_pred
 
     except Exception:
@@ -288,11 +640,19 @@ def forecast_next_6_months_for_itemname(history_df: pd.DataFrame, item_name: str
     Output monthly forecast DF: [month(YYYY-MM), forecast_qty] for next 6 months.
 
     Logic:
-    - If item has >= 12 months of data → use Prophet over 6 months
+    - If item has >= 36 months of data → use Prophet over 6 months
+      (fallback below until its model has been fitted in the background)
+    - If 12-35 months → NumPy trend + month-of-year seasonality (_fast_monthly_forecast)
     - If < 12 months → use the same fallback (moving average) for *each* of the next 6 months.
     """
-    monthly = to_monthly(history_df)
-    item_df = monthly.loc[monthly["item_name"].str.casefold() == item_name.casefold()].copy()
+    return forecast_next_6_months_from_monthly(_item_monthly(history_df, item_name), item_name)
+
+
+def forecast_next_6_months_from_monthly(item_df: pd.DataFrame, item_name: str) -> pd.DataFrame:
+    """
+    Same as forecast_next_6_months_for_itemname, but takes the item's monthly
+    rows (one group of to_monthly()) so bulk callers aggregate only once.
+    """
     if item_df.empty:
         raise ValueError(f"No history found for item: {item_name}")
 
@@ -301,8 +661,10 @@ def forecast_next_6_months_for_itemname(history_df: pd.DataFrame, item_name: str
     # Determine the start month for forecasting: the month after the last observed
     last_month = item_df["month"].max()  # Period('M')
 
-    # If not enough history → fallback repeated for 6 months
-    if n_months < 12:
+    fc = _item_forecast(item_name.casefold(), item_df) if n_months >= 12 else None
+
+    # If not enough history (or no model yet) → fallback repeated for 6 months
+    if fc is None:
         base = fallback_next_month(item_df)
         rows = []
         current_month = last_month
@@ -312,19 +674,7 @@ def forecast_next_6_months_for_itemname(history_df: pd.DataFrame, item_name: str
         return pd.DataFrame(rows)
 
     # Use Prophet for 6 months when history is rich
-    key = item_name.casefold()
-    model = ITEM_MODELS.get(key)
-
-    if model is None:
-        if item_df["y"].dropna().shape[0] < 2:
-            # Can't reasonably fit a time series model
-            raise ValueError(f"Insufficient data to train a model for item: {item_name}")
-
-        model = _fit_monthly_prophet(item_df[["ds", "y"]])
-        ITEM_MODELS[key] = model
-
-    future = model.make_future_dataframe(periods=6, freq="MS", include_history=False)
-    fc = model.predict(future)[["ds", "yhat"]].copy()
+    fc = fc.copy()
     fc["month"] = fc["ds"].dt.to_period("M")
     fc["forecast_qty"] = (
         fc["yhat"]
@@ -346,28 +696,26 @@ def recommended_restock_plan(monthly_fc: pd.DataFrame, current_stock: int) -> pd
     """
     Simulate month-by-month usage and compute restock to keep stock >= 0.
     Returns: [month, forecast_qty, start_stock, recommended_restock, end_stock]
+
+    Restocking only ever tops stock back up to 0, so with x = stock - cumsum(need)
+    the stock after month t is x[t] - min(0, min(x[:t+1])): no per-month loop.
     """
-    stock = int(current_stock)
-    rows = []
-    for _, r in monthly_fc.iterrows():
-        mth = r["month"]
-        need = float(r["forecast_qty"])
-        end_stock = stock - need
-        restock = 0
-        if end_stock < 0:
-            restock = math.ceil(-end_stock)
-            end_stock = 0
-        rows.append(
-            {
-                "month": mth,
-                "forecast_qty": int(round(need)),
-                "start_stock": int(stock),
-                "recommended_restock": int(restock),
-                "end_stock": int(end_stock),
-            }
-        )
-        stock = end_stock
-    return pd.DataFrame(rows)
+    need = monthly_fc["forecast_qty"].to_numpy(dtype=float)
+    x = float(int(current_stock)) - np.cumsum(need)
+    topped_up = -np.minimum(np.minimum.accumulate(x), 0.0)  # restock so far
+    end_stock = x + topped_up
+    start_stock = np.concatenate(([float(int(current_stock))], end_stock))[:-1]
+    restock = np.ceil(np.diff(topped_up, prepend=0.0))
+
+    return pd.DataFrame(
+        {
+            "month": monthly_fc["month"].to_numpy(),
+            "forecast_qty": np.round(need).astype(int),
+            "start_stock": start_stock.astype(int),
+            "recommended_restock": restock.astype(int),
+            "end_stock": end_stock.astype(int),
+        }
+    )
 
 
 def export_month_plan(item_name: str, plan_df: pd.DataFrame, filetype: str = "csv") -> str:
@@ -380,26 +728,99 @@ def export_month_plan(item_name: str, plan_df: pd.DataFrame, filetype: str = "cs
         plan_df.to_csv(out, index=False)
     else:
         out = EXPORT_DIR / f"{safe}_six_month_plan.xlsx"
-        with pd.ExcelWriter(out, engine="openpyxl") as w:  # requires openpyxl
+        with pd.ExcelWriter(out, engine=_XLSX_ENGINE) as w:
             plan_df.to_excel(w, index=False, sheet_name="ForecastPlan")
     return str(out)
 
 
-def all_items_summary(history_df: pd.DataFrame, stock_df: pd.DataFrame) -> pd.DataFrame:
+def _sheet_name(item_name: str, used: set) -> str:
+    """
+    Excel sheet names: <= 31 chars, no []:*?/ or backslash, unique (case-insensitive).
+    """
+    base = "".join("-" if c in '[]:*?/\\' else c for c in item_name).strip("'") or "Item"
+    name, n = base[:31], 1
+    while name.casefold() in used:
+        n += 1
+        suffix = f" ({n})"
+        name = base[: 31 - len(suffix)] + suffix
+    used.add(name.casefold())
+    return name
+
+
+def export_all_plans(plans: Dict[str, pd.DataFrame], path: Optional[Path] = None) -> str:
+    """
+    Save many 6-month plans to one XLSX, one sheet per item, with a single
+    writer (instead of one export_month_plan workbook per item).
+    Returns the file path.
+    """
+    out = path or EXPORT_DIR / "all_items_six_month_plan.xlsx"
+    used: set = set()
+    with pd.ExcelWriter(out, engine=_XLSX_ENGINE) as w:
+        for item_name, plan_df in plans.items():
+            plan_df.to_excel(w, index=False, sheet_name=_sheet_name(item_name, used))
+        if not plans:
+            pd.DataFrame().to_excel(w, index=False, sheet_name="ForecastPlan")
+    return str(out)
+
+
+def all_item_plans(history_df: pd.DataFrame, stock_map: Dict[str, int]) -> Dict[str, pd.DataFrame]:
+    """
+    {item_name: 6-month restock plan} for every item in the history,
+    ordered like all_items_summary; items that fail to forecast are skipped.
+    """
+    groups = monthly_groups(to_monthly(history_df))
+    plans = {}
+    for name in sorted(history_df["item_name"].unique().tolist(), key=str.casefold):
+        try:
+            monthly = forecast_next_6_months_from_monthly(groups[name.casefold()], name)
+        except Exception:
+            continue
+        plans[name] = recommended_restock_plan(monthly, int(stock_map.get(name.casefold(), 0)))
+    return plans
+
+
+def all_items_summary(history_df: pd.DataFrame, stock_map: Dict[str, int]) -> pd.DataFrame:
     """
     Build one row per item_name:
       [item_name, current_stock, total_6mo_forecast, first_month_restock, total_recommended_restock]
-    If an item isn't in stock_df, assume current_stock=0.
+    stock_map is keyed by casefolded item name (services.stock_service.get_stock_map);
+    if an item isn't in it, assume current_stock=0.
     Uses the same 6-month forecast function above (with fallback for sparse items).
+
+    Sparse items (< 12 months) forecast a flat fallback, so their plan has a
+    closed form and is computed for all of them in one vectorized pass;
+    only Prophet-backed items go through the per-item loop.
     """
-    stock_map = {
-        str(n).strip().casefold(): int(q)
-        for n, q in zip(stock_df["item_name"], stock_df["stock_quantity"])
-    }
-    rows = []
-    for name in sorted(history_df["item_name"].unique().tolist(), key=str.casefold):
+    # Aggregate + split per item once (names match case-insensitively,
+    # like forecast_next_6_months_for_itemname)
+    monthly_all = to_monthly(history_df)
+    groups = monthly_groups(monthly_all)
+
+    names = pd.DataFrame(
+        {"item_name": sorted(history_df["item_name"].unique().tolist(), key=str.casefold)}
+    )
+    names["_key"] = names["item_name"].str.casefold()
+    n_months = names["_key"].map(monthly_all.groupby("_key", sort=False, observed=True)["y"].count())
+    sparse = names[n_months < 12]
+
+    # Flat need b for 6 months from stock S: restock max(0, b - S) first,
+    # max(0, 6b - S) in total (stock never goes below 0).
+    base = sparse["_key"].map(fallback_bases(monthly_all)).fillna(0).astype(int)
+    current = sparse["_key"].map(stock_map).fillna(0).astype(int)
+    sparse_table = pd.DataFrame(
+        {
+            "item_name": sparse["item_name"],
+            "current_stock": current,
+            "total_6mo_forecast": 6 * base,
+            "first_month_restock": (base - current).clip(lower=0),
+            "total_recommended_restock": (6 * base - current).clip(lower=0),
+        }
+    )
+
+    rows = {}
+    for idx, name in names.loc[n_months >= 12, "item_name"].items():
         try:
-            monthly = forecast_next_6_months_for_itemname(history_df, name)
+            monthly = forecast_next_6_months_from_monthly(groups[name.casefold()], name)
         except Exception:
             # skip items that fail for any reason
             continue
@@ -411,14 +832,16 @@ def all_items_summary(history_df: pd.DataFrame, stock_df: pd.DataFrame) -> pd.Da
         total_restock = int(plan["recommended_restock"].sum()) if not plan.empty else 0
         first_restock = int(plan.iloc[0]["recommended_restock"]) if not plan.empty else 0
 
-        rows.append(
-            {
-                "item_name": name,
-                "current_stock": current,
-                "total_6mo_forecast": int(round(total_fc)),
-                "first_month_restock": first_restock,
-                "total_recommended_restock": total_restock,
-            }
-        )
+        rows[idx] = {
+            "item_name": name,
+            "current_stock": current,
+            "total_6mo_forecast": int(round(total_fc)),
+            "first_month_restock": first_restock,
+            "total_recommended_restock": total_restock,
+        }
 
-    return pd.DataFrame(rows)
\ No newline at end of file
+    prophet_table = pd.DataFrame(
+        list(rows.values()), index=list(rows), columns=sparse_table.columns
+    )
+    # back to the casefold name order
+    return pd.concat([sparse_table, prophet_table]).sort_index().reset_index(drop=True)
\ No newline at end of file
@@ -0,0 +1,104 @@
+# backend/services/stock_service.py
+from typing import Dict, Tuple
+
+from fastapi import HTTPException
+
+from db import get_db, release_db
+from utils.cache import ttl_cache
+
+
+@ttl_cache(seconds=10)
+def _stock_snapshot() -> Tuple[Dict[str, str], Dict[str, int]]:
+    """
+    One read of `item`, keyed by stripped + casefolded name:
+      (key -> DB item name, key -> stock_quantity)
+    When two items share a key, the last row wins.
+    """
+    conn = get_db()
+    if conn is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT name, stock_quantity FROM item")
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+        release_db(conn)
+
+    names: Dict[str, str] = {}
+    stock: Dict[str, int] = {}
+    for name, qty in rows:
+        name = str(name).strip()
+        key = name.casefold()
+        names[key] = name
+        stock[key] = int(qty)
+    return names, stock
+
+
+def get_stock_map() -> Dict[str, int]:
+    """
+    Current stock by casefolded item name (cached for 10s; don't mutate).
+    Matching to CSV/Excel happens by item_name (case-insensitive).
+    """
+    return _stock_snapshot()[1]
+
+
+def get_stock_names() -> Dict[str, str]:
+    """
+    DB item name by casefolded item name (cached for 10s; don't mutate).
+    """
+    return _stock_snapshot()[0]
+
+
+def get_stock_for_item(name: str) -> int:
+    """
+    Current stock of one item by name (0 if unknown), via the item(name) index.
+    Matching is case-insensitive through the column's _ci collation;
+    duplicates resolve to the newest item, like the snapshot's last-row-wins.
+    """
+    conn = get_db()
+    if conn is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT stock_quantity
+            FROM item
+            WHERE name = %s
+            ORDER BY item_id DESC
+            LIMIT 1
+            """,
+            (name.strip(),),
+        )
+        row = cur.fetchone()
+    finally:
+        cur.close()
+        release_db(conn)
+    return int(row[0]) if row and row[0] is not None else 0
+
+
+@ttl_cache(seconds=10)
+def get_stock_by_id(item_id: int) -> int:
+    """
+    Current stock of one item by id (0 if unknown), cached for 10s per id.
+    """
+    conn = get_db()
+    if conn is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT stock_quantity FROM item WHERE item_id = %s", (item_id,))
+        row = cur.fetchone()
+    finally:
+        cur.close()
+        release_db(conn)
+    return int(row[0]) if row and row[0] is not None else 0
+
+
+def clear_stock_cache() -> None:
+    """
+    Drop the cached stock reads; call after committing a stock change.
+    """
+    _stock_snapshot.cache_clear()
+    get_stock_by_id.cache_clear()
@@ -0,0 +1,39 @@
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple
+
+
+def ttl_cache(seconds: float) -> Callable:
+    """
+    Like functools.lru_cache, but entries expire after `seconds`.
+    Arguments must be hashable. `fn.cache_clear()` drops every entry
+    (call it after writes that change the cached data).
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        entries: Dict[Tuple, Tuple[float, Any]] = {}
+        lock = threading.Lock()
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            with lock:
+                hit = entries.get(key)
+            if hit is not None and hit[0] > now:
+                return hit[1]
+
+            value = fn(*args, **kwargs)
+            with lock:
+                entries[key] = (now + seconds, value)
+            return value
+
+        def cache_clear() -> None:
+            with lock:
+                entries.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
@@ -0,0 +1,21 @@
+from datetime import date
+from typing import Tuple
+
+from fastapi import HTTPException
+
+
+def month_range(year: int, month: int) -> Tuple[date, date]:
+    """
+    Given year & month, return (start_date, end_date) as Python date objects.
+    end_date is the first day of the next month (exclusive).
+    """
+    if month < 1 or month > 12:
+        raise HTTPException(status_code=400, detail="Month must be 1–12.")
+
+    start = date(year, month, 1)
+    if month == 12:
+        end = date(year + 1, 1, 1)
+    else:
+        end = date(year, month + 1, 1)
+
+    return start, end
@@ -1,10 +1,14 @@
-from typing import List, Dict, Any, Optional, Union
-import os, math
+from typing import List, Dict, Any, Optional, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os, math, threading
+import numpy as np
 import pandas as pd
 from fastapi import HTTPException
 import joblib
 
-from db import get_db
+from db import get_db, release_db
+from services.stock_service import get_stock_by_id
 
 # Prophet availability is optional
 try:
@@ -14,14 +18,27 @@ except Exception:
     Prophet = None  # type: ignore
     _HAS_PROPHET = False
 
+PKL_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "model.pkl"))
+
 _PRETRAINED: Optional[Union["Prophet", Dict[str, "Prophet"]]] = None
-try:
-    PKL_PATH = os.path.join(os.path.dirname(__file__), "..", "model.pkl")
-    PKL_PATH = os.path.abspath(PKL_PATH)
-    if os.path.exists(PKL_PATH):
-        _PRETRAINED = joblib.load(PKL_PATH)
-except Exception:
-    _PRETRAINED = None
+_PRETRAINED_LOADED = False
+_PRETRAINED_LOCK = threading.Lock()
+
+def _get_pretrained() -> Optional[Union["Prophet", Dict[str, "Prophet"]]]:
+    """
+    model.pkl, loaded on first use (None if missing or unreadable).
+    """
+    global _PRETRAINED, _PRETRAINED_LOADED
+    if not _PRETRAINED_LOADED:
+        with _PRETRAINED_LOCK:
+            if not _PRETRAINED_LOADED:
+                try:
+                    if os.path.exists(PKL_PATH):
+                        _PRETRAINED = joblib.load(PKL_PATH)
+                except Exception:
+                    _PRETRAINED = None
+                _PRETRAINED_LOADED = True
+    return _PRETRAINED
 
 def has_prophet() -> bool:
     return _HAS_PROPHET
@@ -31,61 +48,89 @@ def is_single_model(obj) -> bool:
         return False
     return hasattr(obj, "make_future_dataframe") and hasattr(obj, "predict")
 
+_YHAT_COLS = ["yhat", "yhat_lower", "yhat_upper"]
+
+def clean_forecast(fc: pd.DataFrame) -> pd.DataFrame:
+    # clip + round the three yhat columns as one float block; models built
+    # with uncertainty_samples=0 have no interval columns: bounds = yhat
+    vals = fc.reindex(columns=_YHAT_COLS).to_numpy(dtype=float)
+    vals[:, 1:] = np.where(np.isnan(vals[:, 1:]), vals[:, :1], vals[:, 1:])
+    vals = np.round(np.clip(vals, 0, None), 2)
+    out = pd.DataFrame(vals, columns=_YHAT_COLS, index=fc.index)
+    out.insert(0, "ds", pd.to_datetime(fc["ds"]).dt.strftime("%Y-%m-%d"))
+    return out
+
+def forecast_records(out: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Rows of a clean_forecast() frame as dicts (a zip over plain lists,
+    cheaper than to_dict(orient="records")).
+    """
+    return [
+        {"ds": ds, "yhat": y, "yhat_lower": lo, "yhat_upper": hi}
+        for ds, (y, lo, hi) in zip(out["ds"].tolist(), out[_YHAT_COLS].to_numpy().tolist())
+    ]
+
 def df_to_records(fc: pd.DataFrame) -> List[Dict[str, Any]]:
-    out = fc[["ds", "yhat", "yhat_lower", "yhat_upper"]].copy()
-    out["ds"] = pd.to_datetime(out["ds"]).dt.strftime("%Y-%m-%d")
-    for c in ["yhat", "yhat_lower", "yhat_upper"]:
-        out[c] = pd.to_numeric(out[c]).clip(lower=0).round(2)
-    return out.to_dict(orient="records")
+    return forecast_records(clean_forecast(fc))
 
 def fetch_daily_series(item_id: int) -> pd.DataFrame:
+    # One row per day from the first to the last sale, 0 on days without
+    # sales: the date spine is generated in SQL (a series can span more days
+    # than the default cte_max_recursion_depth of 1000, hence the hint).
     conn = get_db()
+    if conn is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
     cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT DATE(o.transaction_date) AS ds, SUM(ol.quantity) AS y
-        FROM order_line ol
-        JOIN `order` o ON o.order_id = ol.order_id
-        WHERE ol.item_id = %s
-        GROUP BY DATE(o.transaction_date)
-        ORDER BY ds
-        """,
-        (item_id,),
-    )
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    try:
+        cursor.execute(
+            """
+            WITH RECURSIVE
+              sales AS (
+                SELECT DATE(o.transaction_date) AS ds, SUM(ol.quantity) AS y
+                FROM order_line ol
+                JOIN `order` o ON o.order_id = ol.order_id
+                WHERE ol.item_id = %s
+                  AND o.transaction_date IS NOT NULL
+                GROUP BY DATE(o.transaction_date)
+              ),
+              bounds AS (
+                SELECT MIN(ds) AS lo, MAX(ds) AS hi FROM sales
+              ),
+              spine (ds, hi) AS (
+                SELECT lo, hi FROM bounds WHERE lo IS NOT NULL
+                UNION ALL
+                SELECT ds + INTERVAL 1 DAY, hi FROM spine WHERE ds < hi
+              )
+            SELECT /*+ SET_VAR(cte_max_recursion_depth = 1M) */
+                   spine.ds, COALESCE(sales.y, 0) AS y
+            FROM spine
+            LEFT JOIN sales ON sales.ds = spine.ds
+            ORDER BY spine.ds
+            """,
+            (item_id,),
+        )
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        release_db(conn)
 
     df = pd.DataFrame(rows, columns=["ds", "y"])
     if not df.empty:
         df["ds"] = pd.to_datetime(df["ds"])
         df["y"] = pd.to_numeric(df["y"])
-        full_range = pd.date_range(df["ds"].min(), df["ds"].max(), freq="D")
-        df = (
-            df.set_index("ds")
-              .reindex(full_range, fill_value=0)
-              .rename_axis("ds")
-              .reset_index()
-        )
     return df
 
 def get_current_stock(item_id: Optional[int]) -> int:
     if item_id is None:
         return 0
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT stock_quantity FROM item WHERE item_id=%s", (item_id,))
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    return int(row[0]) if row and row[0] is not None else 0
+    return get_stock_by_id(item_id)
 
-def forecast_with_prophet_df(m: "Prophet", horizon_days: int) -> List[Dict[str, Any]]:
+def forecast_with_prophet_df(m: "Prophet", horizon_days: int) -> pd.DataFrame:
     future = m.make_future_dataframe(periods=horizon_days, freq="D")
     fc = m.predict(future).tail(horizon_days)
-    return df_to_records(fc)
+    return clean_forecast(fc)
 
-def forecast_with_moving_average(df: pd.DataFrame, horizon_days: int, window: int = 14) -> List[Dict[str, Any]]:
+def forecast_with_moving_average(df: pd.DataFrame, horizon_days: int, window: int = 14) -> pd.DataFrame:
     if df.empty:
         base = 0.0
         start_date = pd.Timestamp.today().normalize()
@@ -101,34 +146,88 @@ def forecast_with_moving_average(df: pd.DataFrame, horizon_days: int, window: in
         "yhat_lower": base * 0.8,
         "yhat_upper": base * 1.2,
     })
-    return df_to_records(fc)
+    return clean_forecast(fc)
 
-def forecast_with_pretrained(item_name: Optional[str], horizon_days: int) -> List[Dict[str, Any]]:
-    if _PRETRAINED is None:
+def forecast_with_pretrained(item_name: Optional[str], horizon_days: int) -> pd.DataFrame:
+    pretrained = _get_pretrained()
+    if pretrained is None:
         raise HTTPException(status_code=404, detail="No pretrained model available on server.")
 
     # dict[str, Prophet]
-    if isinstance(_PRETRAINED, dict):
+    if isinstance(pretrained, dict):
         if not item_name:
             raise HTTPException(status_code=400, detail="item_name is required for pretrained dict model.")
-        if item_name not in _PRETRAINED:
+        if item_name not in pretrained:
             raise HTTPException(status_code=404, detail=f"Pretrained model '{item_name}' not found.")
-        model = _PRETRAINED[item_name]
+        model = pretrained[item_name]
         if not is_single_model(model):
             raise HTTPException(status_code=500, detail=f"Stored object for '{item_name}' is not a valid Prophet model.")
         return forecast_with_prophet_df(model, horizon_days)
 
     # single model
-    if is_single_model(_PRETRAINED):
-        return forecast_with_prophet_df(_PRETRAINED, horizon_days)  # type: ignore[arg-type]
+    if is_single_model(pretrained):
+        return forecast_with_prophet_df(pretrained, horizon_days)  # type: ignore[arg-type]
 
     raise HTTPException(status_code=500, detail="Pretrained object is not a valid Prophet model.")
 
 def model_items():
-    if _PRETRAINED is None:
+    pretrained = _get_pretrained()
+    if pretrained is None:
         return {"items": []}
-    if isinstance(_PRETRAINED, dict):
-        return {"items": list(_PRETRAINED.keys())}
-    if is_single_model(_PRETRAINED):
+    if isinstance(pretrained, dict):
+        return {"items": list(pretrained.keys())}
+    if is_single_model(pretrained):
         return {"items": ["default_model"]}
     return {"items": []}
+
+# Worker processes for forecast_all: Prophet's predict is CPU-bound and holds
+# the GIL, so threads don't help. Workers are spawned, not forked: the server
+# process has live threads (AnyIO workers, activity writer, refit executor)
+# and a forked child could inherit one of their locks held. Each worker loads
+# model.pkl once, in its initializer.
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+def _init_worker() -> None:
+    _get_pretrained()
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                workers = int(os.getenv("PREDICT_WORKERS", os.cpu_count() or 1))
+                _POOL = ProcessPoolExecutor(
+                    max_workers=max(1, workers),
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+    return _POOL
+
+def _pretrained_yhat(item_name: str, horizon_days: int) -> Tuple[Optional[np.ndarray], Optional[Tuple[int, Any]]]:
+    """
+    Worker: (yhat, None) or (None, (status_code, detail)).
+    HTTPException is sent back as plain values; it doesn't pickle reliably.
+    """
+    try:
+        fc = forecast_with_pretrained(item_name, horizon_days)
+    except HTTPException as e:
+        return None, (e.status_code, e.detail)
+    return fc["yhat"].to_numpy(), None
+
+def pretrained_yhat_many(names: List[str], horizon_days: int) -> List[np.ndarray]:
+    """
+    yhat arrays for many pretrained items, in the order of `names`,
+    computed across the worker processes.
+    """
+    if len(names) < 2:
+        results = [_pretrained_yhat(n, horizon_days) for n in names]
+    else:
+        results = list(_get_pool().map(_pretrained_yhat, names, [horizon_days] * len(names)))
+
+    out = []
+    for yhat, err in results:
+        if err is not None:
+            raise HTTPException(status_code=err[0], detail=err[1])
+        out.append(yhat)
+    return out
@@ -0,0 +1,87 @@
+import logging
+from decimal import Decimal
+from typing import Any, Iterator
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+
+from db import release_db
+
+
+def _default(obj: Any) -> Any:
+    """
+    Types orjson doesn't handle natively.
+    Decimals follow FastAPI's jsonable_encoder: whole -> int, else float.
+    """
+    if isinstance(obj, Decimal):
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response rendered by orjson (DB rows with Decimal/datetime included).
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def stream_rows(cursor, conn, key: str = "rows", batch_size: int = 500) -> StreamingResponse:
+    """
+    Stream an executed (unbuffered) cursor as {key: [row, ...]},
+    fetching `batch_size` rows at a time instead of fetchall().
+
+    The first batch is read before the response starts, so a DB error
+    there is still a 500. A failure after that can't change the status
+    any more: it is logged and the body ends unterminated, so clients
+    see invalid JSON rather than a short list that parses.
+
+    The response owns cursor and conn: both are closed when the body is
+    done (or the client goes away), so don't borrow conn via db_dep.
+    """
+
+    def close() -> None:
+        try:
+            # drop unread rows so the pooled connection is reusable
+            conn.consume_results()
+        except Exception:
+            pass
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        release_db(conn)
+
+    try:
+        first = cursor.fetchmany(batch_size)
+    except Exception:
+        logging.exception("Reading %s failed", key)
+        close()
+        raise HTTPException(status_code=500, detail="Database error while reading rows")
+
+    def body() -> Iterator[bytes]:
+        try:
+            yield b'{"' + key.encode() + b'":['
+            rows = first
+            sep = b""
+            while rows:
+                yield sep + b",".join(dumps(r) for r in rows)
+                sep = b","
+                rows = cursor.fetchmany(batch_size)
+            yield b"]}"
+        except Exception:
+            # headers (200) are already out; stop here instead of raising
+            # into the server, leaving the JSON unterminated
+            logging.exception("Streaming %s failed", key)
+        finally:
+            close()
+
+    return StreamingResponse(body(), media_type="application/json")